@@ -31,6 +31,8 @@ class Settings:
     host: str = os.getenv("HOST", "0.0.0.0")
     port: int = int(os.getenv("PORT", "8000"))
     workers: int = int(os.getenv("WORKERS", "1"))
+    # Load models in the Gunicorn master (preload_app) so forked workers share them copy-on-write
+    gunicorn_preload: bool = _get_bool("GUNICORN_PRELOAD", False)
 
     app_name: str = os.getenv("APP_NAME", "SpacesAI")
 
@@ -45,6 +47,8 @@ class Settings:
     max_upload_size_mb: int = int(os.getenv("MAX_UPLOAD_SIZE_MB", "50"))
     max_upload_files: int = int(os.getenv("MAX_UPLOAD_FILES", "100"))
     use_pymupdf: bool = _get_bool("USE_PYMUPDF", False)
+    pdf_parse_workers: int = int(os.getenv("PDF_PARSE_WORKERS", "4"))
+    whisper_model: str = os.getenv("WHISPER_MODEL", "base")
     # Upload lifecycle
     delete_uploaded_after_ingest: bool = _get_bool("DELETE_UPLOADED_FILES", False)
 
@@ -109,12 +113,25 @@ class Settings:
     cache_schema_version: str = os.getenv("CACHE_SCHEMA_VERSION", "v1")
     cache_failure_threshold: int = int(os.getenv("CACHE_FAILURE_THRESHOLD", "3"))
     cache_cooldown_seconds: int = int(os.getenv("CACHE_COOLDOWN_SECONDS", "60"))
+    cache_pool_size: int = int(os.getenv("CACHE_POOL_SIZE", "32"))
+    cache_compress_threshold: int = int(os.getenv("CACHE_COMPRESS_THRESHOLD", "4096"))
+    cache_local_ttl_seconds: float = float(os.getenv("CACHE_LOCAL_TTL_SECONDS", "2"))
+    cache_local_max_entries: int = int(os.getenv("CACHE_LOCAL_MAX_ENTRIES", "1024"))
     llm_cache_ttl_seconds: int = int(os.getenv("LLM_CACHE_TTL_SECONDS", "900"))
+    # +/- fraction applied to cache TTLs so entries written together do not expire together
+    cache_ttl_jitter: float = float(os.getenv("CACHE_TTL_JITTER", "0.1"))
+    user_cache_ttl_seconds: int = int(os.getenv("USER_CACHE_TTL_SECONDS", "60"))
+    user_cache_include_hash: bool = _get_bool("USER_CACHE_INCLUDE_HASH", False)
 
     # Vision embeddings & image storage
     image_embed_model: str = os.getenv("IMAGE_EMBED_MODEL", "openclip/ViT-L-14")
     image_embed_dim: int = int(os.getenv("IMAGE_EMBED_DIM", "768"))
     image_embed_device: str = os.getenv("IMAGE_EMBED_DEVICE", "cpu")
+    image_embed_batch_size: int = int(os.getenv("IMAGE_EMBED_BATCH_SIZE", "32"))
+    # 0 = cpu_count - 1; 1 keeps decode in threads
+    image_decode_workers: int = int(os.getenv("IMAGE_DECODE_WORKERS", "0"))
+    image_embed_preload: bool = _get_bool("IMAGE_EMBED_PRELOAD", True)
+    image_embed_compile: bool = _get_bool("IMAGE_EMBED_COMPILE", False)
     enable_image_captioning: bool = _get_bool("ENABLE_IMAGE_CAPTIONING", True)
     image_caption_model: str = os.getenv("IMAGE_CAPTION_MODEL", "llava-hf/llava-1.5-7b-hf")
     image_caption_model_small: str = os.getenv("IMAGE_CAPTION_MODEL_SMALL", "Salesforce/blip-image-captioning-base")
@@ -155,6 +172,7 @@ class Settings:
     cookie_secure: bool = _get_bool("COOKIE_SECURE", False)
     cookie_samesite: str = os.getenv("COOKIE_SAMESITE", "Lax")
     allow_registration: bool = _get_bool("ALLOW_REGISTRATION", True)
+    bcrypt_rounds: int = int(os.getenv("BCRYPT_ROUNDS", "12"))
 
     # Deep Research feature flags
     dr_rerank_enable: bool = _get_bool("DR_RERANK_ENABLE", True)
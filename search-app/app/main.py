@@ -9,7 +9,7 @@ from tempfile import NamedTemporaryFile
 from typing import Any, Dict, List, Optional
 from urllib.parse import urlparse, unquote
 
-from fastapi import FastAPI, File, UploadFile, Request, Form
+from fastapi import Depends, FastAPI, File, UploadFile, Request, Form
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse, HTMLResponse, FileResponse, StreamingResponse, RedirectResponse
 from fastapi.staticfiles import StaticFiles
@@ -28,11 +28,11 @@ from .store import (
     _build_oci_config,
     oci_upload_ready,
 )
-from .search import semantic_search, fulltext_search, hybrid_search, rag, image_search
+from .search import semantic_search, fulltext_search, hybrid_search, rag, arag, image_search
 from .embeddings import get_model, embed_texts
 from .opensearch_adapter import OpenSearchAdapter
 from .session import get_current_user, sign_session, set_session_cookie_headers, clear_session_cookie_headers
-from .valkey_cache import cache_status, bump_revision
+from .valkey_cache import aclose_async_client, cache_status, bump_revisions
 from .runtime_config import (
     get_default_top_k,
     set_default_top_k,
@@ -41,7 +41,7 @@ from .runtime_config import (
     get_os_num_candidates,
     set_os_num_candidates,
 )
-from .users import create_user, authenticate_user, list_spaces, get_default_space_id, create_space, set_default_space
+from .users import create_user_async, authenticate_user_async, list_spaces, get_default_space_id, create_space, set_default_space
 from .deep_research import start_conversation as dr_start, ask as dr_ask
 from .deep_research_store import (
     list_conversations as dr_list_conversations,
@@ -54,6 +54,7 @@ from .vision_embeddings import (
     embed_image_paths,
     embed_image_texts,
     VisionModelUnavailable,
+    preload_before_fork as preload_vision_before_fork,
     vision_dependencies_ready,
 )
 
@@ -262,6 +263,17 @@ app.mount("/static", StaticFiles(directory=str(STATIC_DIR)), name="static")
 templates = Jinja2Templates(directory=str(TEMPLATES_DIR))
 
 
+# Runs at import in the Gunicorn master (GUNICORN_PRELOAD); the lru_cached CLIP model is then inherited
+# by every worker and the startup hook below finds it already loaded. The text model is left to the
+# workers because SentenceTransformer picks CUDA on its own when available, which must not happen pre-fork.
+if settings.gunicorn_preload and settings.enable_image_storage:
+    try:
+        if preload_vision_before_fork():
+            logger.info("Vision model loaded before fork")
+    except Exception as e:
+        logger.warning("Vision model pre-fork load failed; workers will load it: %s", e)
+
+
 @app.on_event("startup")
 def on_startup():
     ensure_dirs()
@@ -277,7 +289,7 @@ def on_startup():
     except Exception as e:
         logger.exception("Failed to preload embeddings model: %s", e)
     if settings.enable_image_storage:
-        ready, detail = vision_dependencies_ready(preload_model=False)
+        ready, detail = vision_dependencies_ready(preload_model=settings.image_embed_preload)
         if ready:
             logger.info("Vision embeddings dependencies detected")
         else:
@@ -303,6 +315,12 @@ def on_startup():
     logger.info("Startup complete: directories ensured and database initialized or deferred")
 
 
+@app.on_event("shutdown")
+async def on_shutdown():
+    # Async Valkey connections are bound to this loop; close them with it
+    await aclose_async_client()
+
+
 # UI route (minimalist, responsive search app)
 @app.get("/", response_class=HTMLResponse)
 async def index(request: Request):
@@ -311,8 +329,7 @@ async def index(request: Request):
 
 # API routes
 @app.get("/api/health")
-def health():
-    cache_info = cache_status()
+def health(cache_info: Dict[str, Any] = Depends(cache_status)):
     status = "ok" if cache_info.get("state") in {"ready", "skipped"} else "degraded"
     return {"status": status, "cache": cache_info}
 
@@ -520,9 +537,7 @@ async def upload(request: Request, files: List[UploadFile] = File(...), space_id
                     logger.exception("Upload diagnostics failed for doc_id=%s", ing.document_id)
             results.append(result_entry)
             is_image = ext in IMAGE_EXTS
-            if is_image:
-                bump_revision("image", uid, sid)
-            bump_revision("text", uid, sid)
+            bump_revisions(("text", "image") if is_image else ("text",), uid, sid)
             # Log activity
             try:
                 with get_conn() as conn:
@@ -576,7 +591,7 @@ async def api_search(request: Request, payload: Dict[str, Any]):
     elif mode == "fulltext":
         hits = fulltext_search(q, top_k=top_k, user_id=uid, space_id=sid)
     elif mode == "rag":
-        answer, hits, used_llm = rag(q, mode="hybrid", top_k=top_k, user_id=uid, space_id=sid, provider_override=provider_override)
+        answer, hits, used_llm = await arag(q, mode="hybrid", top_k=top_k, user_id=uid, space_id=sid, provider_override=provider_override)
     else:
         hits = hybrid_search(q, top_k=top_k, user_id=uid, space_id=sid)
 
@@ -1293,7 +1308,7 @@ async def api_register(payload: Dict[str, Any]):
     if not email or not password:
         return JSONResponse(status_code=400, content={"error": "email and password required"})
     try:
-        u = create_user(email, password)
+        u = await create_user_async(email, password)
         token = sign_session({"user_id": u["id"], "email": email})
         headers = set_session_cookie_headers(token)
         # also return spaces
@@ -1320,7 +1335,7 @@ async def api_login(payload: Dict[str, Any]):
     password = payload.get("password") or ""
     if not email or not password:
         return JSONResponse(status_code=400, content={"error": "email and password required"})
-    u = authenticate_user(email, password)
+    u = await authenticate_user_async(email, password)
     if not u:
         return JSONResponse(status_code=401, content={"error": "invalid credentials"})
     token = sign_session({"user_id": u["id"], "email": email})
@@ -1451,8 +1466,7 @@ async def api_admin_delete_document(request: Request, doc_id: int):
         pass
 
     if destroyed_doc:
-        bump_revision("text", uid, destroyed_doc.get("space_id"))
-        bump_revision("image", uid, destroyed_doc.get("space_id"))
+        bump_revisions(("text", "image"), uid, destroyed_doc.get("space_id"))
 
     try:
         with get_conn() as conn:
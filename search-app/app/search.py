@@ -1,17 +1,33 @@
 from __future__ import annotations
 
+import asyncio
+import functools
 import hashlib
 import logging
 import json
+import threading
+import weakref
+from contextlib import contextmanager
 from dataclasses import dataclass
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
 
 from .config import settings
 from .db import get_conn, set_search_runtime
 from .embeddings import embed_texts
 from .pgvector_utils import to_vec_literal
 from .opensearch_adapter import OpenSearchAdapter
-from .valkey_cache import get_json as cache_get, set_json as cache_set, get_revision
+from .valkey_cache import (
+    aget_hash_with_revision,
+    aset_hash,
+    get_hash_with_revision,
+    get_json as cache_get,
+    get_revision,
+    get_with_revision,
+    jittered_ttl,
+    set_at_revision,
+    set_hash,
+    set_json as cache_set,
+)
 from .runtime_config import get_pgvector_probes
 
 # Mutable flags for Deep Research features (overrides Settings defaults at runtime)
@@ -46,9 +62,9 @@ def _vector_operator() -> str:
 
 def semantic_search(query: str, top_k: int = 10, probes: Optional[int] = None, *, user_id: Optional[int] = None, space_id: Optional[int] = None) -> List[ChunkHit]:
     # Cache key
-    rev = get_revision("text", user_id, space_id)
-    ck = f"sem:{rev}:{user_id}:{space_id}:{top_k}:{query.strip().lower()}"
-    cached = cache_get(ck)
+    # Cached value and the text revision it must match come back in one round trip
+    ck = f"sem:{user_id}:{space_id}:{top_k}:{query.strip().lower()}"
+    cached, rev = get_with_revision(ck, "text", user_id, space_id)
     if cached:
         return [ChunkHit(**h) for h in cached]
 
@@ -79,7 +95,7 @@ def semantic_search(query: str, top_k: int = 10, probes: Optional[int] = None, *
                 distance=distance,
                 rank=score,
             ))
-        cache_set(ck, [vars(x) for x in out])
+        set_at_revision(ck, [vars(x) for x in out], rev)
         return out
 
     # Fallback: Postgres pgvector
@@ -116,14 +132,14 @@ def semantic_search(query: str, top_k: int = 10, probes: Optional[int] = None, *
                 )
             rows = cur.fetchall()
     out = [ChunkHit(chunk_id=r[0], document_id=r[1], chunk_index=r[2], content=r[3], distance=float(r[4])) for r in rows]
-    cache_set(ck, [vars(x) for x in out])
+    set_at_revision(ck, [vars(x) for x in out], rev)
     return out
 
 
 def fulltext_search(query: str, top_k: int = 10, *, user_id: Optional[int] = None, space_id: Optional[int] = None) -> List[ChunkHit]:
-    rev = get_revision("text", user_id, space_id)
-    ck = f"fts:{rev}:{user_id}:{space_id}:{top_k}:{query.strip().lower()}"
-    cached = cache_get(ck)
+    # Cached value and the text revision it must match come back in one round trip
+    ck = f"fts:{user_id}:{space_id}:{top_k}:{query.strip().lower()}"
+    cached, rev = get_with_revision(ck, "text", user_id, space_id)
     if cached:
         return [ChunkHit(**h) for h in cached]
 
@@ -143,7 +159,7 @@ def fulltext_search(query: str, top_k: int = 10, *, user_id: Optional[int] = Non
                 content=src.get("text") or "",
                 rank=float(h.get("_score") or 0.0),
             ))
-        cache_set(ck, [vars(x) for x in out])
+        set_at_revision(ck, [vars(x) for x in out], rev)
         return out
 
     # Fallback: Postgres FTS
@@ -178,7 +194,7 @@ def fulltext_search(query: str, top_k: int = 10, *, user_id: Optional[int] = Non
                 )
             rows = cur.fetchall()
     out = [ChunkHit(chunk_id=r[0], document_id=r[1], chunk_index=r[2], content=r[3], rank=float(r[4])) for r in rows]
-    cache_set(ck, [vars(x) for x in out])
+    set_at_revision(ck, [vars(x) for x in out], rev)
     return out
 
 
@@ -203,21 +219,16 @@ def hybrid_search(query: str, top_k: int = 10, alpha: float = 0.5, *, user_id: O
     return out
 
 
-def _rag_cache_key(query: str, *, user_id: Optional[int], space_id: Optional[int], provider: str, mode: str, top_k: int, hits: List[ChunkHit], context: str) -> str:
-    hasher = hashlib.sha256()
-    hasher.update(query.strip().lower().encode("utf-8"))
-    hasher.update(b"|")
-    chunk_fingerprint = ":".join(f"{h.document_id}-{h.chunk_index}" for h in hits)
-    hasher.update(chunk_fingerprint.encode("utf-8"))
-    hasher.update(b"|")
-    hasher.update(context.encode("utf-8"))
-    digest = hasher.hexdigest()
-    return f"rag:{provider}:{mode}:{user_id}:{space_id}:{top_k}:{digest}"
+def _rag_cache_key(query: str, *, user_id: Optional[int], space_id: Optional[int], provider: str, mode: str, top_k: int) -> str:
+    # The entry records the space's text revision it was answered at (see get_hash_with_revision), so a
+    # hit is found before any retrieval runs and uploads/deletes, which bump the revision, retire it.
+    # "ragh:" holds hashes; older builds wrote JSON strings under "rag:", which HMGET would reject.
+    digest = hashlib.sha256(query.strip().lower().encode("utf-8")).hexdigest()
+    return f"ragh:{provider}:{mode}:{user_id}:{space_id}:{top_k}:{digest}"
 
 
-def rag(query: str, mode: str = "hybrid", top_k: int = 6, *, user_id: Optional[int] = None, space_id: Optional[int] = None, provider_override: Optional[str] = None) -> Tuple[str, List[ChunkHit], bool]:
-    logger.info("rag: query=%r mode=%s top_k=%s provider=%s user_id=%s space_id=%s", query, mode, top_k, provider_override or settings.llm_provider, user_id, space_id)
-    mode = mode.lower()
+def _rag_retrieve(query: str, mode: str, top_k: int, user_id: Optional[int], space_id: Optional[int]) -> Tuple[List[ChunkHit], str]:
+    """Retrieve hits for RAG; returns (hits, context)."""
     if mode == "semantic":
         hits = semantic_search(query, top_k=top_k, user_id=user_id, space_id=space_id)
     elif mode == "fulltext":
@@ -227,14 +238,10 @@ def rag(query: str, mode: str = "hybrid", top_k: int = 6, *, user_id: Optional[i
 
     context = "\n\n".join(h.content for h in hits)
     logger.info("rag: context_chars=%d hits=%d", len(context), len(hits))
+    return hits, context
 
-    provider = (provider_override or settings.llm_provider or "none").lower()
-    cache_key = _rag_cache_key(query, user_id=user_id, space_id=space_id, provider=provider, mode=mode, top_k=top_k, hits=hits, context=context)
-    cached_ans = cache_get(cache_key)
-    if cached_ans and "answer" in cached_ans:
-        logger.debug("rag: cache hit for provider=%s user_id=%s space_id=%s", provider, user_id, space_id)
-        return cached_ans["answer"], hits, bool(cached_ans.get("used_llm", True))
 
+def _rag_answer(query: str, context: str, provider_override: Optional[str]) -> Tuple[str, bool]:
     # Call unified LLM
     try:
         from .llm import chat as llm_chat
@@ -246,17 +253,122 @@ def rag(query: str, mode: str = "hybrid", top_k: int = 6, *, user_id: Optional[i
     used_llm = bool(out)
     answer = out or context
     logger.info("rag: answer_chars=%d used_llm=%s", len(answer or ''), used_llm)
+    return answer, used_llm
+
+
+# Single-flight for RAG answer misses: concurrent callers with the same cache key wait for the first
+# one's retrieval and LLM call instead of each issuing their own (per process; workers still race each other).
+_RAG_FLIGHT_GUARD = threading.Lock()
+_RAG_FLIGHTS: Dict[str, List[Any]] = {}  # cache key -> [lock, holders]
+
+
+@contextmanager
+def _rag_single_flight(key: str) -> Iterator[None]:
+    with _RAG_FLIGHT_GUARD:
+        entry = _RAG_FLIGHTS.get(key)
+        if entry is None:
+            entry = _RAG_FLIGHTS[key] = [threading.Lock(), 0]
+        entry[1] += 1
+    try:
+        with entry[0]:
+            yield
+    finally:
+        with _RAG_FLIGHT_GUARD:
+            entry[1] -= 1
+            if not entry[1]:
+                del _RAG_FLIGHTS[key]
+
+
+# rag() and arag() share one hash entry per answer: answer, used_llm ("1"/"0"), hits as JSON and rev
+_RAG_FIELDS = ("answer", "used_llm", "hits")
+
+
+def _cached_rag(cached: Optional[Dict[str, str]]) -> Optional[Tuple[str, List[ChunkHit], bool]]:
+    if not cached or "answer" not in cached or "hits" not in cached:
+        return None
+    return cached["answer"], [ChunkHit(**h) for h in json.loads(cached["hits"])], cached.get("used_llm", "1") == "1"
+
+
+def _rag_hash(answer: str, hits: List[ChunkHit], used_llm: bool, rev: int) -> Dict[str, Any]:
+    return {"answer": answer, "used_llm": int(used_llm), "hits": json.dumps([vars(h) for h in hits]), "rev": rev}
 
-    if settings.llm_cache_ttl_seconds > 0:
-        cache_set(
-            cache_key,
-            {"answer": answer, "used_llm": used_llm},
-            ttl_seconds=settings.llm_cache_ttl_seconds,
-        )
 
+def rag(query: str, mode: str = "hybrid", top_k: int = 6, *, user_id: Optional[int] = None, space_id: Optional[int] = None, provider_override: Optional[str] = None) -> Tuple[str, List[ChunkHit], bool]:
+    logger.info("rag: query=%r mode=%s top_k=%s provider=%s user_id=%s space_id=%s", query, mode, top_k, provider_override or settings.llm_provider, user_id, space_id)
+    mode = mode.lower()
+    provider = (provider_override or settings.llm_provider or "none").lower()
+    cache_key = _rag_cache_key(query, user_id=user_id, space_id=space_id, provider=provider, mode=mode, top_k=top_k)
+    # Cache-aside check before retrieval: a hit costs no embedding and no kNN/BM25 query, and the answer
+    # and the revision it must match arrive in one pipelined round trip
+    cached, rev = get_hash_with_revision(cache_key, _RAG_FIELDS, "text", user_id, space_id)
+    hit = _cached_rag(cached)
+    if hit is not None:
+        logger.debug("rag: cache hit for user_id=%s space_id=%s", user_id, space_id)
+        return hit
+
+    with _rag_single_flight(cache_key):
+        # Another caller may have filled the entry while we waited
+        cached, rev = get_hash_with_revision(cache_key, _RAG_FIELDS, "text", user_id, space_id)
+        hit = _cached_rag(cached)
+        if hit is not None:
+            return hit
+        hits, context = _rag_retrieve(query, mode, top_k, user_id, space_id)
+        answer, used_llm = _rag_answer(query, context, provider_override)
+        if settings.llm_cache_ttl_seconds > 0:
+            set_hash(cache_key, _rag_hash(answer, hits, used_llm, rev), ttl_seconds=jittered_ttl(settings.llm_cache_ttl_seconds))
+
+    return answer, hits, used_llm
+
+
+# Strong references to in-flight cache writes so they are not garbage collected before completing
+_PENDING_CACHE_WRITES: Set["asyncio.Task[None]"] = set()
+# arag() single-flight: shared retrieval/LLM tasks in progress, by cache key. Tasks belong to their event
+# loop, so there is one map per running loop; a loop's map goes away with it.
+_RAG_INFLIGHT: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, asyncio.Task[Tuple[str, List[ChunkHit], bool]]]]" = weakref.WeakKeyDictionary()
+
+
+async def _arag_compute(cache_key: str, rev: int, query: str, mode: str, top_k: int, user_id: Optional[int], space_id: Optional[int], provider_override: Optional[str]) -> Tuple[str, List[ChunkHit], bool]:
+    hits, context = await asyncio.to_thread(_rag_retrieve, query, mode, top_k, user_id, space_id)
+    answer, used_llm = await asyncio.to_thread(_rag_answer, query, context, provider_override)
+    if settings.llm_cache_ttl_seconds > 0:
+        # Fire-and-forget: the response does not wait for the cache write
+        write = asyncio.create_task(aset_hash(cache_key, _rag_hash(answer, hits, used_llm, rev), ttl_seconds=jittered_ttl(settings.llm_cache_ttl_seconds)))
+        _PENDING_CACHE_WRITES.add(write)
+        write.add_done_callback(_PENDING_CACHE_WRITES.discard)
     return answer, hits, used_llm
 
 
+def _forget_inflight(inflight: Dict[str, Any], cache_key: str, task: "asyncio.Task[Any]") -> None:
+    if inflight.get(cache_key) is task:
+        del inflight[cache_key]
+    if not task.cancelled():
+        task.exception()  # mark retrieved in case every waiter was cancelled
+
+
+async def arag(query: str, mode: str = "hybrid", top_k: int = 6, *, user_id: Optional[int] = None, space_id: Optional[int] = None, provider_override: Optional[str] = None) -> Tuple[str, List[ChunkHit], bool]:
+    """rag() for async handlers: retrieval and the LLM call run in worker threads, the answer cache is
+    read and written with the asyncio Valkey client, so the event loop is never blocked."""
+    logger.info("rag: query=%r mode=%s top_k=%s provider=%s user_id=%s space_id=%s", query, mode, top_k, provider_override or settings.llm_provider, user_id, space_id)
+    mode = mode.lower()
+    provider = (provider_override or settings.llm_provider or "none").lower()
+    cache_key = _rag_cache_key(query, user_id=user_id, space_id=space_id, provider=provider, mode=mode, top_k=top_k)
+    cached, rev = await aget_hash_with_revision(cache_key, _RAG_FIELDS, "text", user_id, space_id)
+    hit = _cached_rag(cached)
+    if hit is not None:
+        logger.debug("rag: cache hit for user_id=%s space_id=%s", user_id, space_id)
+        return hit
+
+    inflight = _RAG_INFLIGHT.setdefault(asyncio.get_running_loop(), {})
+    task = inflight.get(cache_key)
+    if task is None:
+        task = asyncio.create_task(_arag_compute(cache_key, rev, query, mode, top_k, user_id, space_id, provider_override))
+        inflight[cache_key] = task
+        task.add_done_callback(functools.partial(_forget_inflight, inflight, cache_key))
+    # Every caller, the first included, waits through shield: a disconnected client cancels only its own
+    # wait, never the shared work the other callers are waiting on
+    return await asyncio.shield(task)
+
+
 def image_search(query: Optional[str], vector: Optional[List[float]], top_k: int, *, user_id: Optional[int], space_id: Optional[int], tags: Optional[List[str]] = None) -> List[Dict[str, Any]]:
     rev = get_revision("image", user_id, space_id)
     key_parts = [
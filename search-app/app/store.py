@@ -1,12 +1,16 @@
 from __future__ import annotations
 
+import functools
 import json
 import logging
+import mmap
+import os
 from dataclasses import dataclass
 from pathlib import Path
 from typing import Any, Dict, List, Optional, Sequence, Tuple
 import re
 
+import numpy as np
 import psycopg
 from datetime import datetime, timedelta
 from urllib.parse import quote as urlquote
@@ -16,7 +20,7 @@ from .db import get_conn
 from .embeddings import embed_texts
 from .vision_embeddings import embed_image_paths, vision_dependencies_ready, VisionModelUnavailable
 from .image_captioning import generate_caption
-from .text_utils import ChunkParams, chunk_text, read_text_from_file
+from .text_utils import NORMALIZED_SOURCE_TYPES, ChunkParams, chunk_text, read_text_from_file
 from .pgvector_utils import to_vec_literal
 from .opensearch_adapter import OpenSearchAdapter
 
@@ -28,6 +32,9 @@ except Exception:
 
 logger = logging.getLogger(__name__)
 
+# Above this size, uploads from disk go through UploadManager (multipart) instead of a single put_object
+OCI_MULTIPART_THRESHOLD = 128 * 1024 * 1024
+
 
 @dataclass
 class IngestResult:
@@ -56,6 +63,12 @@ def _dated_rel(base_name: str, user_email: Optional[str]) -> Path:
     return sub / base_name
 
 
+@functools.lru_cache(maxsize=8)
+def _q(s: str) -> str:
+    """URL-encode a path segment; namespace/bucket names repeat across uploads so results are cached."""
+    return urlquote(s, safe="")
+
+
 def _build_oci_config():
     try:
         import oci  # type: ignore
@@ -188,7 +201,8 @@ def _derive_image_tags_caption(img: "Image.Image", file_path: str, metadata: Opt
     return tags, heuristic_caption, None
 
 
-def _upload_to_oci(bucket_name: str, object_name: str, data: bytes, expire_seconds: int = 3600) -> Optional[str]:
+def _upload_to_oci(bucket_name: str, object_name: str, data: Optional[bytes], expire_seconds: int = 3600, *, file_path: Optional[str] = None) -> Optional[str]:
+    """Upload bytes (or a file already on disk via ``file_path``) and return a read PAR URL."""
     try:
         import oci  # type: ignore
 
@@ -219,8 +233,11 @@ def _upload_to_oci(bucket_name: str, object_name: str, data: bytes, expire_secon
         )
         par = resp.data
 
-        # upload the bytes
-        osc.put_object(ns, bucket_name, object_name, data)
+        if file_path is not None:
+            _put_file_to_oci(oci, osc, ns, bucket_name, object_name, file_path)
+        else:
+            # upload the bytes
+            osc.put_object(ns, bucket_name, object_name, data)
 
         # access_uri typically like: /p/{PAR_ID}/n/{ns}/b/{bucket}/o/{object_name}
         region = (cfg.get("region") or region or "").strip()
@@ -231,6 +248,23 @@ def _upload_to_oci(bucket_name: str, object_name: str, data: bytes, expire_secon
         return None
 
 
+def _put_file_to_oci(oci_mod, osc, ns: str, bucket_name: str, object_name: str, file_path: str) -> None:
+    """Send a local file to Object Storage without holding a second copy of it in the Python heap.
+    Large files use multipart upload_file; smaller ones are streamed from a read-only mmap.
+    """
+    size = os.path.getsize(file_path)
+    if size > OCI_MULTIPART_THRESHOLD:
+        upload_manager = oci_mod.object_storage.UploadManager(osc, allow_parallel_uploads=True)
+        upload_manager.upload_file(ns, bucket_name, object_name, file_path)
+        return
+    if size == 0:
+        # mmap cannot map empty files
+        osc.put_object(ns, bucket_name, object_name, b"")
+        return
+    with open(file_path, "rb") as fh, mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        osc.put_object(ns, bucket_name, object_name, mm)
+
+
 def create_par_for_object(object_name: str, expire_seconds: int = 900) -> Optional[str]:
     if not object_name or not settings.oci_os_bucket_name or not settings.oci_os_upload_enabled:
         return None
@@ -326,7 +360,7 @@ def save_upload(file_bytes: bytes, filename: str, user_email: Optional[str] = No
             logger.warning(msg)
         else:
             obj_name = str(dated_rel).replace("\\", "/")
-            oci_url = _upload_to_oci(settings.oci_os_bucket_name, obj_name, file_bytes)
+            oci_url = _upload_to_oci(settings.oci_os_bucket_name, obj_name, None, file_path=str(target))
 
     return str(target), oci_url
 
@@ -377,7 +411,7 @@ def save_upload_stream(fileobj, filename: str, user_email: Optional[str] = None)
                 upload_manager.upload_stream(ns, settings.oci_os_bucket_name, object_name, fileobj)
                 region = (cfg.get("region") or region or "").strip()
                 base = f"https://objectstorage.{region}.oraclecloud.com" if region else "https://objectstorage.oraclecloud.com"
-                oci_url = f"{base}/n/{urlquote(ns)}/b/{urlquote(settings.oci_os_bucket_name)}/o/{urlquote(object_name)}"
+                oci_url = f"{base}/n/{_q(ns)}/b/{_q(settings.oci_os_bucket_name)}/o/{urlquote(object_name)}"
                 logger.info("OCI streaming upload complete: bucket=%s object=%s url=%s", settings.oci_os_bucket_name, object_name, oci_url)
             else:
                 detail = "OCI credentials/config missing"
@@ -408,14 +442,16 @@ def insert_document(conn: psycopg.Connection, user_id: int, space_id: Optional[i
     return int(doc_id)
 
 
-def insert_chunks(conn: psycopg.Connection, document_id: int, chunks: Sequence[str], embeddings: Sequence[Sequence[float]]) -> int:
-    if len(chunks) != len(embeddings):
+def insert_chunks(conn: psycopg.Connection, document_id: int, chunks: Sequence[str], embeddings: Sequence[Sequence[float]] | np.ndarray) -> int:
+    # Accepts the 2-D array sentence-transformers produces or plain lists; rows go to to_vec_literal
+    # as-is, so the caller's precision is kept and nothing is converted when embeddings are not stored
+    if len(embeddings) != len(chunks):
         raise ValueError("Chunks and embeddings length mismatch")
     with conn.cursor() as cur:
         if settings.db_store_embeddings:
             rows = []
-            for i, (content, emb) in enumerate(zip(chunks, embeddings)):
-                rows.append((document_id, i, content, len(content), settings.embedding_model_name, to_vec_literal(emb)))
+            for i, content in enumerate(chunks):
+                rows.append((document_id, i, content, len(content), settings.embedding_model_name, to_vec_literal(embeddings[i])))
             cur.executemany(
                 """
                 INSERT INTO chunks (document_id, chunk_index, content, content_chars, embedding_model, embedding)
@@ -449,7 +485,7 @@ def _update_document_metadata(conn: psycopg.Connection, doc_id: int, metadata: D
 def ingest_file_path(file_path: str, user_id: int, space_id: Optional[int] = None, title: Optional[str] = None, metadata: Optional[dict] = None, chunk_params: Optional[ChunkParams] = None) -> IngestResult:
     text, source_type = read_text_from_file(file_path)
     cp = chunk_params or ChunkParams(settings.chunk_size, settings.chunk_overlap)
-    chunks = chunk_text(text, cp)
+    chunks = chunk_text(text, cp, normalized=source_type in NORMALIZED_SOURCE_TYPES)
     embeddings: List[List[float]] = []
     if chunks:
         embeddings = embed_texts(chunks)
@@ -1,16 +1,22 @@
 from __future__ import annotations
 
+import codecs
+import functools
+import io
+import mmap
 import os
 import re
 import logging
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from dataclasses import dataclass
-from typing import List, Tuple
+from typing import Iterable, List, Optional, Sequence, Tuple
 import csv
 import json
+from collections import Counter
 
-from bs4 import BeautifulSoup
-from pypdf import PdfReader
-from docx import Document
 from .config import settings
 
 logger = logging.getLogger(__name__)
@@ -21,7 +27,32 @@ PARA_SPLIT_RE = re.compile(r"(?:\r?\n){2,}")
 SENTENCE_SPLIT_RE = re.compile(r"(?<=[.!?])\s+")
 UPPER_HEADING_RE = re.compile(r"^[A-Z0-9][A-Z0-9 \-:]{2,}$")
 NUMBERED_HEADING_RE = re.compile(r"^(?:[IVXLCDM]+\.|\d+(?:\.\d+)*\.|[A-Z]\.)\s+.+")
+# Either heading form as a whole line, scanned once over the text by _insert_heading_boundaries
+_HEADING_RE = re.compile(r"^(?:[A-Z0-9][A-Z0-9 \-:]{2,}|(?:[IVXLCDM]+\.|\d+(?:\.\d+)*\.|[A-Z]\.)[^\S\n]+.+)$", re.M)
 PAGE_FOOTER_RE = re.compile(r"^\s*page\s+\d+(?:\s+of\s+\d+)?\s*$", re.I)
+# Whitespace / hyphenation cleanup patterns (compiled once; used on every page and document)
+_CRLF_RE = re.compile(r"\r\n?")
+# Line breaks as seen by the normalizer: CRLF, lone CR and LF (other separators like \v or \x85 fold to spaces)
+_LINE_BREAK_RE = re.compile(r"\r\n?|\n")
+# Raw extractor pages also use form feeds. Unlike str.splitlines, re.split keeps the empty element after a
+# trailing newline, so a page ending in "\n" never has its real last line compared as a footer.
+_PAGE_LINE_RE = re.compile(r"\r\n?|\n|\f")
+# Anything _normalize_whitespace_preserve_paragraphs would rewrite (CR, non-space whitespace, double spaces,
+# spaces at line edges, 3+ newlines); no match plus no outer whitespace means the text is already normalized
+_NOT_NORMALIZED_RE = re.compile(r"[^\S \n]| {2}| \n|\n |\n{3}")
+_HYPH_NL_RE = re.compile(r"-\n(?=\w)")
+_LONE_HYPH_RE = re.compile(r"\n-\n")
+_SINGLE_NL_RE = re.compile(r"(?<!\n)\n(?!\n)")
+# Plain-text files above this size are decoded and normalized in blocks instead of one full read
+# (same throughput as the single read, so only the smallest files skip it)
+_TXT_STREAM_THRESHOLD = 4 * 1024 * 1024
+_TXT_STREAM_BLOCK = 1024 * 1024
+
+
+# Split-then-merge bounds, relative to the effective chunk size: chunks shorter than the tiny ratio are
+# folded into a neighbour as long as the result stays under the upper ratio.
+_TINY_CHUNK_RATIO = 0.25
+_MERGE_UPPER_RATIO = 1.2
 
 
 @dataclass
@@ -34,82 +65,104 @@ class ChunkParams:
 
 def _normalize_whitespace_preserve_paragraphs(text: str) -> str:
     """Normalize whitespace but preserve blank lines as paragraph boundaries."""
-    # Normalize line endings
-    text = text.replace("\r\n", "\n").replace("\r", "\n")
-    # Collapse more than two consecutive newlines to exactly two
-    text = re.sub(r"\n{3,}", "\n\n", text)
-    # Normalize spaces within lines
-    lines = []
-    for ln in text.split("\n"):
-        ln = re.sub(r"\s+", " ", ln).strip()
-        lines.append(ln)
-    text = "\n".join(lines)
-    # Restore paragraph boundaries
-    text = re.sub(r"(\n\s*){3,}", "\n\n", text)
-    return text.strip()
+    # One pass over the lines: collapse whitespace runs within each line and keep at most one blank line
+    out: List[str] = []
+    append = out.append
+    blank = 0
+    for line in _LINE_BREAK_RE.split(text):
+        s = " ".join(line.split())
+        if not s:
+            blank += 1
+            continue
+        if blank and out:
+            append("")
+        append(s)
+        blank = 0
+    return "\n".join(out)
+
+
+def _is_normalized(text: str) -> bool:
+    """True when _normalize_whitespace_preserve_paragraphs(text) would return text unchanged (one scan, no copies)."""
+    if not text:
+        return True
+    if text[0].isspace() or text[-1].isspace():
+        return False
+    return _NOT_NORMALIZED_RE.search(text) is None
 
 
 def _fix_hyphenation(text: str) -> str:
     """Fix common PDF hyphenation like 'exam-\nple' -> 'example'."""
     # Join words broken by hyphen at line end
-    text = re.sub(r"-\n(?=\w)", "", text)
+    text = _HYPH_NL_RE.sub("", text)
     # Remove lone hyphens surrounded by newlines
-    text = re.sub(r"\n-\n", "\n", text)
+    text = _LONE_HYPH_RE.sub("\n", text)
     # Replace single newlines inside paragraphs with spaces (but keep double newlines)
-    text = text.replace("\r\n", "\n").replace("\r", "\n")
-    text = re.sub(r"(?<!\n)\n(?!\n)", " ", text)
+    text = _CRLF_RE.sub("\n", text)
+    text = _SINGLE_NL_RE.sub(" ", text)
     return text
 
 
 def _insert_heading_boundaries(text: str) -> str:
-    """Insert extra blank lines around detected headings to improve chunk boundaries."""
-    out_lines: List[str] = []
-    for ln in text.split("\n"):
-        if UPPER_HEADING_RE.match(ln) or NUMBERED_HEADING_RE.match(ln):
-            if out_lines and out_lines[-1] != "":
-                out_lines.append("")
-            out_lines.append(ln)
-            out_lines.append("")
-        else:
-            out_lines.append(ln)
-    return "\n".join(out_lines)
+    """Insert extra blank lines around detected headings to improve chunk boundaries.
+    Expects normalized text (LF line breaks only); headings are found in one scan and spliced in place.
+    """
+    parts: List[str] = []
+    append = parts.append
+    prev = 0
+    last_end = -1
+    for m in _HEADING_RE.finditer(text):
+        start, end = m.span()
+        append(text[prev:start])
+        # Blank line before unless the heading opens the text or follows a blank line or another heading
+        if start >= 2 and text[start - 2] != "\n" and start - 1 != last_end:
+            append("\n")
+        append(text[start:end])
+        append("\n")
+        prev = last_end = end
+    if not parts:
+        return text
+    append(text[prev:])
+    return "".join(parts)
 
 
 def _remove_common_headers_footers(pages: List[str]) -> List[str]:
     """Heuristic removal of repeating headers/footers across pages."""
     if not pages or len(pages) < 3:
         return pages
-    # Collect first and last non-empty lines per page
+    # Split every page once; the same line lists are counted and then cleaned
+    page_lines = [_PAGE_LINE_RE.split(p) for p in pages]
+    # First and last non-empty line of every page that has any text
     first_lines: List[str] = []
     last_lines: List[str] = []
-    for p in pages:
-        ls = [line.strip() for line in p.split("\n") if line.strip()]
-        if not ls:
-            first_lines.append("")
-            last_lines.append("")
-            continue
-        first_lines.append(ls[0])
-        last_lines.append(ls[-1])
-    def most_common(cand: List[str]) -> str:
-        from collections import Counter
-        c = Counter([x for x in cand if x])
-        return c.most_common(1)[0][0] if c else ""
-    first_common = most_common(first_lines)
-    last_common = most_common(last_lines)
+    for ls in page_lines:
+        first = next((t for t in (line.strip() for line in ls) if t), None)
+        if first is not None:
+            first_lines.append(first)
+            last_lines.append(next(t for t in (line.strip() for line in reversed(ls)) if t))
+    # Counter(iterable) counts in C rather than one Python-level += per page
+    first_c = Counter(first_lines)
+    last_c = Counter(last_lines)
+    first_common = first_c.most_common(1)[0][0] if first_c else ""
+    last_common = last_c.most_common(1)[0][0] if last_c else ""
+    footer_match = PAGE_FOOTER_RE.match
     cleaned_pages: List[str] = []
-    for p in pages:
-        ls = p.split("\n")
+    for ls in page_lines:
         if first_common:
             ls = ls[1:] if ls and ls[0].strip() == first_common else ls
         if last_common:
             if ls and ls[-1].strip() == last_common:
                 ls = ls[:-1]
         # Remove generic page footers like "Page X of Y"
-        ls = [line for line in ls if not PAGE_FOOTER_RE.match(line.strip())]
+        ls = [line for line in ls if not footer_match(line.strip())]
         cleaned_pages.append("\n".join(ls))
     return cleaned_pages
 
 
+# read_text_from_file source types whose extractors return whitespace-normalized text. PDF is excluded:
+# its heading boundaries can leave runs of three newlines, which chunk_text must collapse first.
+NORMALIZED_SOURCE_TYPES = frozenset({"html", "docx", "pptx", "xlsx", "txt", "xml", "csv", "md", "json", "image", "audio", "video"})
+
+
 def read_text_from_file(path: str) -> Tuple[str, str]:
     """
     Return (text, source_type) from a supported file.
@@ -152,27 +205,120 @@ def read_text_from_file(path: str) -> Tuple[str, str]:
         raise ValueError(f"Unsupported file type: {ext}")
 
 
+def _pymupdf_page_range(path: str, start: int, stop: int) -> List[str]:
+    """Extract text for pages [start, stop) from a freshly opened document (runs in a worker process)."""
+    import fitz  # PyMuPDF
+
+    with fitz.open(path) as doc:
+        # Use textual extraction; "text" preserves reading order better than "blocks" in many docs
+        return [doc.load_page(i).get_text("text") or "" for i in range(start, stop)]
+
+
+# Below this many pages a worker pool costs more than it saves
+_PARALLEL_PDF_MIN_PAGES = 8
+
+
+def _pdf_parse_workers() -> int:
+    return min(os.cpu_count() or 1, max(1, int(getattr(settings, "pdf_parse_workers", 4) or 1)))
+
+
+def _page_ranges(page_count: int) -> List[Tuple[int, int]]:
+    """Contiguous [start, stop) page ranges, one per PDF parse worker."""
+    workers = min(_pdf_parse_workers(), page_count)
+    if page_count < _PARALLEL_PDF_MIN_PAGES or workers <= 1:
+        return [(0, page_count)]
+    step = -(-page_count // workers)
+    return [(s, min(s + step, page_count)) for s in range(0, page_count, step)]
+
+
+# One PDF parse pool per process, reused across uploads. Spawned (not forked) so children never inherit
+# the server's DB/Valkey connections or locks held by its other threads.
+_pdf_pool: Optional[ProcessPoolExecutor] = None
+_pdf_pool_broken = False
+_pdf_pool_lock = threading.Lock()
+
+
+def _get_pdf_pool() -> Optional[ProcessPoolExecutor]:
+    global _pdf_pool
+    with _pdf_pool_lock:
+        if _pdf_pool is None and not _pdf_pool_broken:
+            _pdf_pool = ProcessPoolExecutor(
+                max_workers=_pdf_parse_workers(),
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _pdf_pool
+
+
+def _map_page_ranges(fn, path: str, page_count: int) -> List[str]:
+    """Run fn(path, start, stop) over the page ranges, in worker processes when there is more than one."""
+    global _pdf_pool, _pdf_pool_broken
+    ranges = _page_ranges(page_count)
+    pool = _get_pdf_pool() if len(ranges) > 1 else None
+    if pool is None:
+        return fn(path, 0, page_count)
+    pages: List[str] = []
+    try:
+        for part in pool.map(fn, [path] * len(ranges), [r[0] for r in ranges], [r[1] for r in ranges]):
+            pages.extend(part)
+    except BrokenProcessPool as exc:  # a worker died; parse errors in fn still propagate
+        logger.warning("PDF parse process pool failed; parsing in-process: %s", exc)
+        with _pdf_pool_lock:
+            if _pdf_pool is pool:
+                pool.shutdown(wait=False, cancel_futures=True)
+                _pdf_pool = None
+                _pdf_pool_broken = True
+        return fn(path, 0, page_count)
+    return pages
+
+
+def _extract_pages_pymupdf(path: str) -> List[str]:
+    """Extract page texts with PyMuPDF, fanning page ranges out across processes.
+    MuPDF is not thread-safe, so each worker opens its own handle; order is preserved via map().
+    """
+    import fitz  # PyMuPDF
+
+    with fitz.open(path) as doc:
+        page_count = doc.page_count
+    return _map_page_ranges(_pymupdf_page_range, path, page_count)
+
+
+def _pdfplumber_page_range(path: str, start: int, stop: int) -> List[str]:
+    """pdfplumber text for pages [start, stop), hyphenation fixed (runs in a worker process)."""
+    import pdfplumber  # type: ignore
+
+    with pdfplumber.open(path) as pdf:
+        # Tolerances can help capture columns/tables better
+        return [_fix_hyphenation(pdf.pages[i].extract_text(x_tolerance=1, y_tolerance=1) or "") for i in range(start, stop)]
+
+
+def _extract_pages_pypdfium2(path: str) -> List[str]:
+    """Extract page texts with pypdfium2 (PDFium C++ text extractor)."""
+    import pypdfium2 as pdfium  # type: ignore
+
+    pdf = pdfium.PdfDocument(path)
+    try:
+        # PDFium emits CRLF line breaks; normalize so the hyphenation patterns see plain newlines
+        return [_CRLF_RE.sub("\n", pdf[i].get_textpage().get_text_range() or "") for i in range(len(pdf))]
+    finally:
+        pdf.close()
+
+
 def extract_text_from_pdf(path: str) -> str:
     """Robust PDF extraction.
     Order of preference:
-      1) PyMuPDF (if enabled): page.get_text("text"); remove common headers/footers; hyphenation fix; preserve paragraphs
-      2) pypdf: page.extract_text(); hyphenation fix; preserve paragraphs
-      3) pdfplumber fallback for table/figure-heavy PDFs when pypdf output is sparse
+      1) PyMuPDF (if enabled): page.get_text("text"); remove common headers/footers; per-page hyphenation fix; preserve paragraphs
+      2) pypdfium2 (if installed): same pipeline as PyMuPDF; skipped when its output is sparse
+      3) pypdf: page.extract_text(); per-page hyphenation fix; preserve paragraphs
+      4) pdfplumber fallback for table/figure-heavy PDFs when pypdf output is sparse
     """
     # Optional: use PyMuPDF if enabled and available for better extraction
     if getattr(settings, "use_pymupdf", False):
         try:
-            import fitz  # PyMuPDF
-            pages_raw: List[str] = []
-            with fitz.open(path) as doc:
-                for page in doc:
-                    # Use textual extraction; "text" preserves reading order better than "blocks" in many docs
-                    t = page.get_text("text") or ""
-                    pages_raw.append(t)
+            pages_raw = _extract_pages_pymupdf(path)
             # Remove common headers/footers
             pages_clean = _remove_common_headers_footers(pages_raw)
-            text = "\n\n".join(pages_clean)
-            text = _fix_hyphenation(text)
+            # Hyphenation is page-local; fixing it per page keeps the regex work on small strings
+            text = "\n\n".join(_fix_hyphenation(p) for p in pages_clean)
             text = _normalize_whitespace_preserve_paragraphs(text)
             # Insert heading boundaries to help chunking
             text = _insert_heading_boundaries(text)
@@ -181,17 +327,29 @@ def extract_text_from_pdf(path: str) -> str:
             # Fall back to other extractors if PyMuPDF is not available or fails
             pass
 
+    # pypdfium2: C++ extractor, much faster than the pure-Python readers below
+    try:
+        pages_clean = _remove_common_headers_footers(_extract_pages_pypdfium2(path))
+        text = "\n\n".join(_fix_hyphenation(p) for p in pages_clean)
+        text = _normalize_whitespace_preserve_paragraphs(text)
+        if len(text) >= 200:
+            return _insert_heading_boundaries(text)
+    except Exception:
+        # Not installed or failed on this file; fall back to pypdf/pdfplumber
+        pass
+
     # pypdf extraction
+    from pypdf import PdfReader
+
     reader = PdfReader(path)
     texts_pypdf: List[str] = []
     try:
         for page in reader.pages:
-            txt = page.extract_text() or ""
+            txt = _fix_hyphenation(page.extract_text() or "")
             texts_pypdf.append(txt)
     except Exception:
         texts_pypdf = []
     text_pypdf = "\n\n".join(texts_pypdf)
-    text_pypdf = _fix_hyphenation(text_pypdf)
     text_pypdf = _normalize_whitespace_preserve_paragraphs(text_pypdf)
     text_pypdf = _insert_heading_boundaries(text_pypdf)
 
@@ -201,13 +359,10 @@ def extract_text_from_pdf(path: str) -> str:
         try:
             import pdfplumber  # type: ignore
             with pdfplumber.open(path) as pdf:
-                pages_text = []
-                for page in pdf.pages:
-                    # Tolerances can help capture columns/tables better
-                    t = page.extract_text(x_tolerance=1, y_tolerance=1) or ""
-                    pages_text.append(t)
+                page_count = len(pdf.pages)
+            # pdfminer is pure Python, so page ranges go to worker processes rather than threads
+            pages_text = _map_page_ranges(_pdfplumber_page_range, path, page_count)
             text_plumb = "\n\n".join(pages_text)
-            text_plumb = _fix_hyphenation(text_plumb)
             text_plumb = _normalize_whitespace_preserve_paragraphs(text_plumb)
             text_plumb = _insert_heading_boundaries(text_plumb)
             # Prefer the better (longer, more structured) output
@@ -220,10 +375,20 @@ def extract_text_from_pdf(path: str) -> str:
     return text_pypdf
 
 
+def _make_soup(data: bytes, features: str, fallback: str):
+    """Parse with the C-backed lxml builder when installed, else the given pure-Python fallback."""
+    from bs4 import BeautifulSoup, FeatureNotFound
+
+    try:
+        return BeautifulSoup(data, features)
+    except FeatureNotFound:
+        return BeautifulSoup(data, fallback)
+
+
 def extract_text_from_html(path: str) -> str:
     with open(path, "rb") as f:
         data = f.read()
-    soup = BeautifulSoup(data, "html.parser")
+    soup = _make_soup(data, "lxml", "html.parser")
     # Remove nav-like elements
     for tag in soup(["script", "style", "nav", "header", "footer"]):
         tag.decompose()
@@ -235,27 +400,111 @@ def extract_text_from_html(path: str) -> str:
 def extract_text_from_xml(path: str) -> str:
     with open(path, "rb") as f:
         data = f.read()
-    soup = BeautifulSoup(data, "xml")
+    soup = _make_soup(data, "lxml-xml", "html.parser")
     text = soup.get_text(separator="\n", strip=True)
     text = _normalize_whitespace_preserve_paragraphs(text)
     return text
 
 
+def _newline_count(ws: str) -> int:
+    # Newlines in a whitespace run after CRLF/CR folding
+    return ws.count("\n") + ws.count("\r") - ws.count("\r\n")
+
+
+def _stream_normalized_text(path: str, block_size: int = _TXT_STREAM_BLOCK) -> str:
+    """Decode and normalize a large text file block by block over an mmap, so only the normalized
+    output is held in full. Blocks are cut after a newline and the blank-line gap between blocks is
+    carried across, giving the same result as normalizing the whole file at once.
+    """
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="ignore")
+    out: List[str] = []
+    gap = 0  # newlines seen since the last emitted non-blank text
+    carry = ""
+
+    def emit(piece: str) -> None:
+        nonlocal gap
+        norm = _normalize_whitespace_preserve_paragraphs(piece)
+        if not norm:
+            gap += _newline_count(piece)
+            return
+        stripped = piece.lstrip()
+        if out:
+            gap += _newline_count(piece[: len(piece) - len(stripped)])
+            out.append("\n\n" if gap >= 2 else "\n")
+        out.append(norm)
+        gap = _newline_count(stripped[len(stripped.rstrip()):])
+
+    with open(path, "rb") as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            size = len(mm)
+            for pos in range(0, size, block_size):
+                buf = carry + decoder.decode(mm[pos:pos + block_size])
+                cut = buf.rfind("\n") + 1
+                if cut:
+                    emit(buf[:cut])
+                carry = buf[cut:]
+    carry += decoder.decode(b"", final=True)
+    if carry:
+        emit(carry)
+    return "".join(out)
+
+
 def extract_text_from_txt(path: str) -> str:
+    if os.path.getsize(path) > _TXT_STREAM_THRESHOLD:
+        return _stream_normalized_text(path)
     with open(path, "r", encoding="utf-8", errors="ignore") as f:
         text = f.read()
     text = _normalize_whitespace_preserve_paragraphs(text)
     return text
 
 
-def extract_text_from_csv(path: str) -> str:
-    parts: List[str] = []
+def _csv_rows_pyarrow(path: str) -> Optional[Iterable[Sequence[str]]]:
+    """Parse a CSV with pyarrow's multi-threaded C++ reader; returns None when pyarrow is not installed.
+    Every column is read as a string (no type inference, no header row) so cell text matches the csv module.
+    """
+    try:
+        import pyarrow as pa  # type: ignore
+        import pyarrow.csv as pacsv  # type: ignore
+    except ImportError:
+        return None
+    # Column count comes from the first record; ragged rows make pyarrow raise and the caller falls back
     with open(path, newline="", encoding="utf-8", errors="ignore") as f:
-        reader = csv.reader(f)
-        for row in reader:
-            parts.append(" \t ".join(cell.strip() for cell in row if cell))
-    text = "\n".join(parts)
-    text = _normalize_whitespace_preserve_paragraphs(text)
+        first = next(csv.reader(f), None)
+    if not first:
+        return None
+    names = [f"f{i}" for i in range(len(first))]
+    table = pacsv.read_csv(
+        path,
+        read_options=pacsv.ReadOptions(column_names=names),
+        parse_options=pacsv.ParseOptions(newlines_in_values=True),
+        convert_options=pacsv.ConvertOptions(column_types={n: pa.string() for n in names}),
+    )
+    return zip(*(col.to_pylist() for col in table.columns))
+
+
+def _write_csv_rows(buf: io.StringIO, rows: Iterable[Sequence[str]]) -> None:
+    write = buf.write
+    for row in rows:
+        # strip() returns the cell itself when there is nothing to trim; it matters for cells that open or
+        # close with a quoted line break, which the normalizer would otherwise turn into a row break
+        write(" \t ".join(cell.strip() for cell in row if cell))
+        write("\n")
+
+
+def extract_text_from_csv(path: str) -> str:
+    # Rows stream into one buffer that is normalized once
+    buf = io.StringIO()
+    try:
+        rows = _csv_rows_pyarrow(path)
+    except Exception as e:
+        logger.debug("pyarrow CSV read failed for %s (%s); using csv module", path, e)
+        rows = None
+    if rows is not None:
+        _write_csv_rows(buf, rows)
+    else:
+        with open(path, newline="", encoding="utf-8", errors="ignore") as f:
+            _write_csv_rows(buf, csv.reader(f))
+    text = _normalize_whitespace_preserve_paragraphs(buf.getvalue())
     return text
 
 
@@ -268,21 +517,25 @@ def extract_text_from_json(path: str) -> str:
     try:
         with open(path, "r", encoding="utf-8", errors="ignore") as f:
             data = json.load(f)
-        # Convert JSON to a flat text string
+        # Convert JSON to a flat text string (iterative DFS so deep documents cannot hit the recursion limit)
         def _flatten(obj) -> List[str]:
             out: List[str] = []
-            if isinstance(obj, dict):
-                for k, v in obj.items():
-                    out.append(str(k))
-                    out.extend(_flatten(v))
-            elif isinstance(obj, list):
-                for it in obj:
-                    out.extend(_flatten(it))
-            else:
-                out.append(str(obj))
+            stack = [obj]
+            while stack:
+                cur = stack.pop()
+                if isinstance(cur, dict):
+                    # Push in reverse so keys/values pop in document order; keys go on as plain strings (leaves)
+                    for k, v in reversed(cur.items()):
+                        stack.append(v)
+                        stack.append(str(k))
+                elif isinstance(cur, list):
+                    stack.extend(reversed(cur))
+                else:
+                    out.append(str(cur))
             return out
         parts = _flatten(data)
-        text = "\n".join(s.strip() for s in parts if s and isinstance(s, str))
+        # Every part is already a str; only empty leaves need dropping
+        text = "\n".join(s.strip() for s in parts if s)
         text = _normalize_whitespace_preserve_paragraphs(text)
         return text
     except Exception:
@@ -291,6 +544,8 @@ def extract_text_from_json(path: str) -> str:
 
 
 def extract_text_from_docx(path: str) -> str:
+    from docx import Document
+
     doc = Document(path)
     parts: List[str] = []
     for p in doc.paragraphs:
@@ -310,26 +565,13 @@ def extract_text_from_pptx(path: str) -> str:
     prs = Presentation(path)
     parts: List[str] = []
     for slide in prs.slides:
-        # Shapes with text
+        # Single pass over shapes using python-pptx's own predicates (no exception-driven hasattr probing)
         for shape in slide.shapes:
-            try:
-                if hasattr(shape, 'text') and shape.text:
-                    parts.append(shape.text)
-            except Exception:
-                continue
-        # Tables
-        for shape in slide.shapes:
-            try:
-                if not hasattr(shape, 'table') or shape.table is None:
-                    continue
-                tbl = shape.table
-                for row in tbl.rows:
-                    cells = []
-                    for cell in row.cells:
-                        cells.append((cell.text or '').strip())
-                    parts.append(" \t ".join(cells))
-            except Exception:
-                continue
+            if shape.has_text_frame:
+                parts.append(shape.text_frame.text)
+            elif shape.has_table:
+                for row in shape.table.rows:
+                    parts.append(" \t ".join((cell.text or "").strip() for cell in row.cells))
     text = "\n\n".join([p.strip() for p in parts if p and p.strip()])
     return _normalize_whitespace_preserve_paragraphs(text)
 
@@ -343,16 +585,13 @@ def extract_text_from_xlsx(path: str) -> str:
     parts: List[str] = []
     for ws in wb.worksheets:
         parts.append(f"# Sheet: {ws.title}")
-        for row in ws.iter_rows(values_only=True):
-            vals = []
-            for v in row:
-                if v is None:
-                    continue
-                s = str(v).strip()
-                if s:
-                    vals.append(s)
-            if vals:
-                parts.append(" \t ".join(vals))
+        # Bound columns to the sheet's dimension so trailing empty cells are not scanned
+        for row in ws.iter_rows(values_only=True, max_col=ws.max_column):
+            row_text = " \t ".join(
+                s for v in row if v is not None and (s := (v.strip() if isinstance(v, str) else str(v).strip()))
+            )
+            if row_text:
+                parts.append(row_text)
     text = "\n".join(parts)
     return _normalize_whitespace_preserve_paragraphs(text)
 
@@ -373,6 +612,13 @@ def extract_text_from_image(path: str) -> str:
     return _normalize_whitespace_preserve_paragraphs(txt or "")
 
 
+@functools.lru_cache(maxsize=2)
+def _load_whisper(name: str = "base"):
+    import whisper  # type: ignore
+
+    return whisper.load_model(name)
+
+
 def extract_text_from_av(path: str, kind: str = "audio") -> str:
     """Transcribe audio/video using Whisper if available; video is first converted to audio via ffmpeg-python.
     kind: 'audio' or 'video'
@@ -381,7 +627,7 @@ def extract_text_from_av(path: str, kind: str = "audio") -> str:
         import tempfile
         import subprocess
         try:
-            import whisper  # type: ignore
+            import whisper  # type: ignore  # noqa: F401
         except Exception as e:
             raise ValueError("Audio/Video transcription requires optional dependency openai-whisper (whisper)") from e
 
@@ -410,9 +656,9 @@ def extract_text_from_av(path: str, kind: str = "audio") -> str:
                 except Exception as e:
                     raise ValueError("Failed to extract audio from video; install ffmpeg or ffmpeg-python") from e
 
-        # Transcribe with Whisper (uses default/base model; customize as needed)
+        # Transcribe with Whisper (model from WHISPER_MODEL; loaded once per process)
         try:
-            model = whisper.load_model("base")
+            model = _load_whisper(settings.whisper_model)
             result = model.transcribe(src)
             text = (result.get("text") or "").strip()
         finally:
@@ -429,58 +675,201 @@ def extract_text_from_av(path: str, kind: str = "audio") -> str:
 
 
 
-def _recursive_split(text: str, chunk_size: int, separators: tuple[str, ...]) -> List[str]:
-    if not text:
-        return []
-    if len(text) <= chunk_size or not separators:
-        return [text]
-
-    sep = separators[0]
-    if sep:
-        pieces = text.split(sep)
-        rebuilt: List[str] = []
-        buf = ""
-        joiner = sep
-        for piece in pieces:
-            candidate = (buf + joiner + piece) if buf else piece
-            if len(candidate) <= chunk_size:
-                buf = candidate
+def _split_spans(
+    text: str,
+    start: int,
+    end: int,
+    chunk_size: int,
+    separators: tuple[str, ...],
+    spans: List[Tuple[int, int]],
+    joiners: Optional[List[str]],
+    lead: str,
+    depth: int = 0,
+) -> None:
+    """Separator cascade over ``text[start:end]``, appending ``(start, end)`` spans of the pieces to ``spans``.
+    Piece boundaries are located with ``str.find`` and the greedy buffer is a span of the source text
+    (pieces joined by the separator are contiguous there), so no substrings are built while splitting.
+    ``depth`` indexes the active separator, so recursion shares one tuple instead of slicing it.
+    """
+    if start >= end:
+        return
+    if end - start <= chunk_size or depth >= len(separators):
+        if joiners is not None:
+            joiners.append(lead)
+        spans.append((start, end))
+        return
+
+    sep = separators[depth]
+    if not sep:
+        for i in range(start, end, chunk_size):
+            spans.append((i, min(i + chunk_size, end)))
+        if joiners is not None:
+            joiners.append(lead)
+            joiners.extend([""] * (len(range(start, end, chunk_size)) - 1))
+        return
+
+    find = text.find
+    sep_len = len(sep)
+    emitted = False
+    buf_start = buf_end = start
+    buf_len = 0
+    pos = start
+    while True:
+        j = find(sep, pos, end)
+        last = j < 0
+        if last:
+            j = end
+        piece_len = j - pos
+        new_len = (buf_len + sep_len + piece_len) if buf_len else piece_len
+        if new_len <= chunk_size:
+            if not buf_len:
+                buf_start = pos
+            buf_end = j
+            buf_len = new_len
+        else:
+            if buf_len:
+                if joiners is not None:
+                    joiners.append(sep if emitted else lead)
+                spans.append((buf_start, buf_end))
+                emitted = True
+            if piece_len <= chunk_size:
+                buf_start, buf_end, buf_len = pos, j, piece_len
             else:
-                if buf:
-                    rebuilt.append(buf)
-                if len(piece) <= chunk_size:
-                    buf = piece
-                else:
-                    rebuilt.extend(_recursive_split(piece, chunk_size, separators[1:]))
-                    buf = ""
-        if buf:
-            rebuilt.append(buf)
-        return rebuilt
-    else:
-        return [text[i : i + chunk_size] for i in range(0, len(text), chunk_size)]
+                n = len(spans)
+                _split_spans(text, pos, j, chunk_size, separators, spans, joiners, sep if emitted else lead, depth + 1)
+                emitted = emitted or len(spans) > n
+                buf_len = 0
+        if last:
+            break
+        pos = j + sep_len
+    if buf_len:
+        if joiners is not None:
+            joiners.append(sep if emitted else lead)
+        spans.append((buf_start, buf_end))
+
+
+def _recursive_split(
+    text: str,
+    chunk_size: int,
+    separators: tuple[str, ...],
+    joiners: Optional[List[str]] = None,
+    lead: str = "",
+) -> List[str]:
+    """Greedy separator-cascade split.
+    When ``joiners`` is given, the separator that preceded each emitted piece in the source text is appended
+    to it (``lead`` for the first piece), so callers can re-join neighbours faithfully.
+    """
+    spans: List[Tuple[int, int]] = []
+    _split_spans(text, 0, len(text), chunk_size, separators, spans, joiners, lead)
+    return [text[s:e] for s, e in spans]
+
+
+def _split_then_merge(text: str, chunk_size: int, min_size: int, upper: int, separators: tuple[str, ...]) -> List[str]:
+    """Two-pass chunker: split until every piece fits, then greedily merge neighbours.
+    Pass 1 is the separator cascade; it leaves short tails wherever it had to recurse into an oversized piece.
+    Pass 2 merges adjacent pieces while the result still fits ``chunk_size``. Afterwards anything above ``upper``
+    is re-split, and chunks shorter than ``min_size`` are folded into a neighbour when the union stays within ``upper``.
+    Neighbours are re-joined with the separator that originally stood between them.
+    """
+    joiners: List[str] = []
+    pieces = _recursive_split(text, chunk_size, separators, joiners)
+    if not pieces:
+        return []
+
+    # Pass 2: greedy merge of adjacent pieces
+    merged: List[str] = []
+    merged_joiners: List[str] = []
+    acc: List[str] = []
+    acc_len = 0
+    for piece, joiner in zip(pieces, joiners):
+        if acc and acc_len + len(joiner) + len(piece) <= chunk_size:
+            acc.append(joiner)
+            acc.append(piece)
+            acc_len += len(joiner) + len(piece)
+            continue
+        if acc:
+            merged.append("".join(acc))
+        merged_joiners.append(joiner)
+        acc = [piece]
+        acc_len = len(piece)
+    if acc:
+        merged.append("".join(acc))
+
+    # Re-split oversized blobs through the same cascade
+    sized: List[str] = []
+    sized_joiners: List[str] = []
+    for chunk, joiner in zip(merged, merged_joiners):
+        if len(chunk) > upper:
+            sized.extend(_recursive_split(chunk, upper, separators, sized_joiners, joiner))
+        else:
+            sized.append(chunk)
+            sized_joiners.append(joiner)
+
+    # Fold tiny chunks into the previous neighbour (or absorb a tiny previous chunk) within the upper bound
+    out: List[str] = []
+    for chunk, joiner in zip(sized, sized_joiners):
+        if out and (len(chunk) < min_size or len(out[-1]) < min_size) and len(out[-1]) + len(joiner) + len(chunk) <= upper:
+            out[-1] = "".join((out[-1], joiner, chunk))
+        else:
+            out.append(chunk)
+    return out
 
 
 def _apply_overlap(chunks: List[str], overlap: int) -> List[str]:
     if overlap <= 0 or not chunks:
         return chunks
     out: List[str] = []
+    append = out.append
+    tail_slice = slice(-overlap, None)
     prev_tail = ""
     for ch in chunks:
-        prefix = prev_tail
-        combined = (prefix + ch) if prefix else ch
-        out.append(combined)
-        prev_tail = ch[-overlap:]
+        append("".join((prev_tail, ch)) if prev_tail else ch)
+        prev_tail = ch[tail_slice] if len(ch) >= overlap else ch
     return out
 
 
-def chunk_text(text: str, params: ChunkParams = ChunkParams()) -> List[str]:
+def _paragraph_lengths(text: str) -> List[int]:
+    """Lengths of the non-blank paragraphs between PARA_SPLIT_RE boundaries, without slicing them out.
+    Only short spans are inspected for being whitespace-only: normalized text cannot hold longer blank spans.
+    """
+    lens: List[int] = []
+    prev = 0
+    for m in PARA_SPLIT_RE.finditer(text):
+        start = m.start()
+        span = start - prev
+        if span > 0 and (span > 64 or not text[prev:start].isspace()):
+            lens.append(span)
+        prev = m.end()
+    span = len(text) - prev
+    if span > 0 and (span > 64 or not text[prev:].isspace()):
+        lens.append(span)
+    return lens
+
+
+def chunk_text(text: str, params: Optional[ChunkParams] = None, normalized: bool = False) -> List[str]:
     """Split text into chunks with optional adaptive sizing.
     When CHUNK_AUTO_TUNE=true, choose a chunk size based on paragraph statistics
     clamped to [CHUNK_MIN_SIZE, CHUNK_MAX_SIZE], and set overlap proportionally
     using CHUNK_OVERLAP_RATIO.
+    Pass ``normalized=True`` when the text is known to be whitespace-normalized (see NORMALIZED_SOURCE_TYPES)
+    to skip the normalization check; heading boundaries are still inserted.
     """
-    # Normalize while preserving paragraph boundaries; add extra spacing around likely headings
-    text = _normalize_whitespace_preserve_paragraphs(text)
+    params = params or ChunkParams()
+    # Fast path: a text that already fits in one chunk needs no heading boundaries or auto-tuning.
+    # Auto-tune never picks a size below min(chunk_size, CHUNK_MAX_SIZE), so that is the safe bound.
+    single_limit = int(params.chunk_size)
+    if getattr(settings, "chunk_auto_tune", False):
+        single_limit = min(single_limit, int(getattr(settings, "chunk_max_size", 3500)))
+    if len(text) <= single_limit * 0.9:
+        # Normalization only ever shrinks the text, so the result still fits
+        if not normalized and not _is_normalized(text):
+            text = _normalize_whitespace_preserve_paragraphs(text)
+        return [text] if text else []
+
+    # Normalize while preserving paragraph boundaries (extractors usually already did); add extra spacing
+    # around likely headings
+    if not normalized and not _is_normalized(text):
+        text = _normalize_whitespace_preserve_paragraphs(text)
     text = _insert_heading_boundaries(text)
 
     # Start with configured defaults
@@ -490,12 +879,12 @@ def chunk_text(text: str, params: ChunkParams = ChunkParams()) -> List[str]:
     # Adaptive tuning based on paragraph distribution
     try:
         if getattr(settings, "chunk_auto_tune", False):
-            paras = [p for p in re.split(PARA_SPLIT_RE, text) if p and p.strip()]
-            if paras:
-                import statistics
-                lens = [len(p) for p in paras]
-                med = int(statistics.median(lens)) if lens else eff_chunk_size
-                avg = int(sum(lens) / max(1, len(lens))) if lens else eff_chunk_size
+            para_lens = _paragraph_lengths(text)
+            if para_lens:
+                import numpy as np
+                lens = np.asarray(para_lens, dtype=np.int64)
+                med = int(np.median(lens))
+                avg = int(lens.mean())
                 # Heuristic target: 2.5x median or 2x average, whichever larger, but within min/max
                 target = max(
                     int(getattr(settings, "chunk_min_size", 800)),
@@ -513,7 +902,27 @@ def chunk_text(text: str, params: ChunkParams = ChunkParams()) -> List[str]:
         eff_chunk_size = int(params.chunk_size)
         eff_overlap = int(params.chunk_overlap)
 
-    base_chunks = _recursive_split(text, eff_chunk_size, params.separators)
+    base_chunks = _split_then_merge(
+        text,
+        eff_chunk_size,
+        int(eff_chunk_size * _TINY_CHUNK_RATIO),
+        int(eff_chunk_size * _MERGE_UPPER_RATIO),
+        params.separators,
+    )
     if not base_chunks:
         return []
-    return _apply_overlap(base_chunks, eff_overlap)
\ No newline at end of file
+    if eff_overlap >= eff_chunk_size:
+        # Every chunk would repeat its whole predecessor; keep at least one fresh character per chunk
+        logger.warning("Chunk overlap %d >= chunk size %d; capping overlap", eff_overlap, eff_chunk_size)
+        eff_overlap = eff_chunk_size - 1
+    return _apply_overlap(base_chunks, eff_overlap)
+
+# Compiled versions of the hot string loops, when the optional Cython extension has been built (see setup.py)
+try:
+    from .text_utils_fast import (  # type: ignore
+        _apply_overlap,
+        _normalize_whitespace_preserve_paragraphs,
+        _split_spans,
+    )
+except ImportError:
+    pass
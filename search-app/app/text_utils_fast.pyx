@@ -0,0 +1,112 @@
+# cython: language_level=3, boundscheck=False, wraparound=False
+"""Compiled twins of the tight string loops in text_utils.
+
+Built only when Cython is available (see setup.py); text_utils imports these when the extension exists and
+keeps its pure-Python versions otherwise. Behaviour must stay identical to the Python functions.
+"""
+import re
+
+# Same pattern as text_utils._LINE_BREAK_RE
+_LINE_BREAK_RE = re.compile(r"\r\n?|\n")
+
+
+cpdef str _normalize_whitespace_preserve_paragraphs(str text):
+    cdef list out = []
+    cdef Py_ssize_t blank = 0
+    cdef str line, s
+    for line in _LINE_BREAK_RE.split(text):
+        s = " ".join(line.split())
+        if not s:
+            blank += 1
+            continue
+        if blank and out:
+            out.append("")
+        out.append(s)
+        blank = 0
+    return "\n".join(out)
+
+
+cpdef void _split_spans(
+    str text,
+    Py_ssize_t start,
+    Py_ssize_t end,
+    Py_ssize_t chunk_size,
+    tuple separators,
+    list spans,
+    object joiners,
+    str lead,
+    Py_ssize_t depth=0,
+):
+    cdef str sep
+    cdef Py_ssize_t sep_len, buf_start, buf_end, buf_len, pos, j, piece_len, new_len, n, i
+    cdef bint emitted, last
+    if start >= end:
+        return
+    if end - start <= chunk_size or depth >= len(separators):
+        if joiners is not None:
+            joiners.append(lead)
+        spans.append((start, end))
+        return
+
+    sep = separators[depth]
+    if not sep:
+        n = 0
+        for i in range(start, end, chunk_size):
+            spans.append((i, min(i + chunk_size, end)))
+            n += 1
+        if joiners is not None:
+            joiners.append(lead)
+            joiners.extend([""] * (n - 1))
+        return
+
+    sep_len = len(sep)
+    emitted = False
+    buf_start = buf_end = start
+    buf_len = 0
+    pos = start
+    while True:
+        j = text.find(sep, pos, end)
+        last = j < 0
+        if last:
+            j = end
+        piece_len = j - pos
+        new_len = (buf_len + sep_len + piece_len) if buf_len else piece_len
+        if new_len <= chunk_size:
+            if not buf_len:
+                buf_start = pos
+            buf_end = j
+            buf_len = new_len
+        else:
+            if buf_len:
+                if joiners is not None:
+                    joiners.append(sep if emitted else lead)
+                spans.append((buf_start, buf_end))
+                emitted = True
+            if piece_len <= chunk_size:
+                buf_start = pos
+                buf_end = j
+                buf_len = piece_len
+            else:
+                n = len(spans)
+                _split_spans(text, pos, j, chunk_size, separators, spans, joiners, sep if emitted else lead, depth + 1)
+                emitted = emitted or len(spans) > n
+                buf_len = 0
+        if last:
+            break
+        pos = j + sep_len
+    if buf_len:
+        if joiners is not None:
+            joiners.append(sep if emitted else lead)
+        spans.append((buf_start, buf_end))
+
+
+cpdef list _apply_overlap(list chunks, Py_ssize_t overlap):
+    if overlap <= 0 or not chunks:
+        return chunks
+    cdef list out = []
+    cdef str ch
+    cdef str prev_tail = ""
+    for ch in chunks:
+        out.append(prev_tail + ch if prev_tail else ch)
+        prev_tail = ch[len(ch) - overlap:] if len(ch) >= overlap else ch
+    return out
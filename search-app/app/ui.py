@@ -1,6 +1,8 @@
 from __future__ import annotations
 
 import json
+import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import gradio as gr
 from typing import List
 
@@ -11,6 +13,15 @@ from .db import get_conn
 from .config import settings
 
 
+def _ingest_one(path: str, chunk_size: int, chunk_overlap: int) -> str:
+    """Save and ingest one uploaded file."""
+    with open(path, "rb") as f:
+        data = f.read()
+    saved = save_upload(data, os.path.basename(path))
+    res = ingest_file_path(saved, chunk_params=ChunkParams(int(chunk_size), int(chunk_overlap)))
+    return f"{os.path.basename(path)}: document_id={res.document_id}, chunks={res.num_chunks}"
+
+
 def build_ui():
     ensure_dirs()
 
@@ -36,17 +47,19 @@ def build_ui():
             chunk_overlap = gr.Number(value=200, precision=0, label="Chunk overlap (chars)")
             ingest_btn = gr.Button("Ingest")
 
-            def do_ingest(file_list: List[str], chunk_size: int, chunk_overlap: int):
+            def do_ingest(file_list: List[str], chunk_size: int, chunk_overlap: int, progress=gr.Progress()):
                 if not file_list:
                     return "No files provided"
-                results = []
-                for path in file_list:
-                    import os
-                    with open(path, "rb") as f:
-                        data = f.read()
-                    saved = save_upload(data, os.path.basename(path))
-                    res = ingest_file_path(saved, chunk_params=ChunkParams(int(chunk_size), int(chunk_overlap)))
-                    results.append(f"{os.path.basename(path)}: document_id={res.document_id}, chunks={res.num_chunks}")
+                if len(file_list) == 1:
+                    return _ingest_one(file_list[0], chunk_size, chunk_overlap)
+                # Threads, not processes: forking the server would copy its DB/Valkey connections and held locks.
+                # Large-PDF parsing already fans out to processes in text_utils and encoding releases the GIL.
+                results: List[str] = [""] * len(file_list)
+                with ThreadPoolExecutor(max_workers=min(os.cpu_count() or 1, 4, len(file_list))) as ex:
+                    futs = {ex.submit(_ingest_one, path, chunk_size, chunk_overlap): i for i, path in enumerate(file_list)}
+                    for done, fut in enumerate(as_completed(futs), 1):
+                        results[futs[fut]] = fut.result()
+                        progress(done / len(file_list), desc=f"Ingested {done}/{len(file_list)}")
                 return "\n".join(results)
 
             ingest_btn.click(do_ingest, inputs=[files, chunk_size, chunk_overlap], outputs=[status])
@@ -60,10 +73,10 @@ def build_ui():
             results = gr.Textbox(label="Results", lines=12)
 
             def _rows_to_text(rows):
-                out_lines = []
-                for r in rows:
-                    out_lines.append(" | ".join("" if x is None else str(x) for x in r[:5]) + " | " + r[5])
-                return "\n\n".join(out_lines)
+                _str = str
+                return "\n\n".join(
+                    " | ".join(["" if x is None else _str(x) for x in r[:5]] + [r[5]]) for r in rows
+                )
 
             def do_search(q: str, m: str, k: int):
                 m = m.lower()
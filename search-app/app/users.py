@@ -1,15 +1,22 @@
 from __future__ import annotations
 
+import asyncio
 import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
 from typing import Optional, List
 
 from passlib.context import CryptContext
 
+from .config import settings
 from .db import get_conn
+from .valkey_cache import delete_keys as cache_delete, get_json as cache_get, set_json as cache_set
 
 logger = logging.getLogger(__name__)
 
-_pwd_ctx = CryptContext(schemes=["bcrypt"], deprecated="auto")
+_pwd_ctx = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__default_rounds=settings.bcrypt_rounds)
+# bcrypt's C code releases the GIL, so concurrent logins hash in parallel off the event loop
+_BCRYPT_POOL = ThreadPoolExecutor(max_workers=os.cpu_count() or 4, thread_name_prefix="bcrypt")
 
 
 def hash_password(password: str) -> str:
@@ -23,64 +30,121 @@ def verify_password(password: str, password_hash: str) -> bool:
         return False
 
 
-def get_user_by_email(email: str) -> Optional[dict]:
-    with get_conn() as conn:
-        with conn.cursor() as cur:
-            cur.execute("SELECT id, email, password_hash, created_at, last_login_at FROM users WHERE email = %s", (email,))
-            row = cur.fetchone()
-            if not row:
-                return None
-            return {
-                "id": int(row[0]),
-                "email": row[1],
-                "password_hash": row[2],
-                "created_at": (row[3].isoformat() if row[3] else None),
-                "last_login_at": (row[4].isoformat() if row[4] else None),
-            }
+async def hash_password_async(password: str) -> str:
+    return await asyncio.get_running_loop().run_in_executor(_BCRYPT_POOL, hash_password, password)
 
 
+async def verify_password_async(password: str, password_hash: str) -> bool:
+    return await asyncio.get_running_loop().run_in_executor(_BCRYPT_POOL, verify_password, password, password_hash)
 
-def get_user_by_id(user_id: int) -> Optional[dict]:
+
+def _email_cache_key(email: str) -> str:
+    # users.email is CITEXT, so lookups differing only in case are the same user and share one entry
+    return f"user:email:{email.lower()}"
+
+
+def _user_cache_keys(user_id: int, email: str) -> tuple[str, str]:
+    return f"user:id:{user_id}", _email_cache_key(email)
+
+
+_USER_COLUMNS = "SELECT id, email, password_hash, created_at, last_login_at FROM users"
+_USER_QUERIES = {
+    "id": _USER_COLUMNS + " WHERE id = %s",
+    "email": _USER_COLUMNS + " WHERE email = %s",
+}
+
+
+def _invalidate_user(user_id: int, email: str) -> None:
+    cache_delete(*_user_cache_keys(user_id, email))
+
+
+def _fetch_user(column: str, value: object, cache_key: str, need_hash: bool = False) -> Optional[dict]:
+    ttl = settings.user_cache_ttl_seconds
+    use_cache = ttl > 0 and (settings.user_cache_include_hash or not need_hash)
+    if use_cache:
+        cached = cache_get(cache_key)
+        if cached:
+            return cached
     with get_conn() as conn:
         with conn.cursor() as cur:
-            cur.execute("SELECT id, email, password_hash, created_at, last_login_at FROM users WHERE id = %s", (user_id,))
+            cur.execute(_USER_QUERIES[column], (value,))
             row = cur.fetchone()
             if not row:
                 return None
-            return {
+            user = {
                 "id": int(row[0]),
                 "email": row[1],
                 "password_hash": row[2],
                 "created_at": (row[3].isoformat() if row[3] else None),
                 "last_login_at": (row[4].isoformat() if row[4] else None),
             }
+    # Only fill the cache on paths that read it: need_hash callers (logins) bypass it and then
+    # invalidate the user anyway, so writing here would be wasted
+    if use_cache:
+        entry = user if settings.user_cache_include_hash else {**user, "password_hash": None}
+        for key in _user_cache_keys(user["id"], user["email"]):
+            cache_set(key, entry, ttl_seconds=ttl)
+    return user
 
 
+def get_user_by_email(email: str, *, need_hash: bool = False) -> Optional[dict]:
+    """Look up a user by email, served from Valkey for USER_CACHE_TTL_SECONDS.
+    Cached entries carry no password hash unless USER_CACHE_INCLUDE_HASH is set; pass ``need_hash`` to
+    read through to Postgres in that case.
+    """
+    return _fetch_user("email", email, _email_cache_key(email), need_hash)
 
-def create_user(email: str, password: str) -> dict:
-    ph = hash_password(password)
+
+def get_user_by_id(user_id: int, *, need_hash: bool = False) -> Optional[dict]:
+    return _fetch_user("id", user_id, f"user:id:{int(user_id)}", need_hash)
+
+
+def _insert_user(email: str, password_hash: str) -> dict:
     with get_conn() as conn:
         with conn.cursor() as cur:
             cur.execute(
                 "INSERT INTO users (email, password_hash) VALUES (%s, %s) RETURNING id",
-                (email, ph),
+                (email, password_hash),
             )
             uid = int(cur.fetchone()[0])
+    _invalidate_user(uid, email)
     # Ensure a default space
     ensure_default_space(uid)
     return {"id": uid, "email": email}
 
 
+def create_user(email: str, password: str) -> dict:
+    return _insert_user(email, hash_password(password))
+
+
+async def create_user_async(email: str, password: str) -> dict:
+    return _insert_user(email, await hash_password_async(password))
+
+
+def _touch_last_login(user_id: int, email: str) -> None:
+    with get_conn() as conn:
+        with conn.cursor() as cur:
+            cur.execute("UPDATE users SET last_login_at = now() WHERE id = %s", (user_id,))
+    _invalidate_user(user_id, email)
+
+
 def authenticate_user(email: str, password: str) -> Optional[dict]:
-    u = get_user_by_email(email)
+    u = get_user_by_email(email, need_hash=True)
     if not u:
         return None
     if not verify_password(password, u.get("password_hash") or ""):
         return None
-    # update last_login_at
-    with get_conn() as conn:
-        with conn.cursor() as cur:
-            cur.execute("UPDATE users SET last_login_at = now() WHERE id = %s", (u["id"],))
+    _touch_last_login(u["id"], u["email"])
+    return {"id": u["id"], "email": u["email"]}
+
+
+async def authenticate_user_async(email: str, password: str) -> Optional[dict]:
+    u = get_user_by_email(email, need_hash=True)
+    if not u:
+        return None
+    if not await verify_password_async(password, u.get("password_hash") or ""):
+        return None
+    _touch_last_login(u["id"], u["email"])
     return {"id": u["id"], "email": u["email"]}
 
 
@@ -97,20 +161,30 @@ def ensure_default_space(user_id: int) -> int:
                 "INSERT INTO spaces (user_id, name, is_default) VALUES (%s, %s, TRUE) RETURNING id",
                 (user_id, "My Space"),
             )
-            return int(cur.fetchone()[0])
+            sid = int(cur.fetchone()[0])
+    cache_delete(_default_space_key(user_id))
+    return sid
 
 
 def create_space(user_id: int, name: str, is_default: bool = False) -> int:
     with get_conn() as conn:
         with conn.cursor() as cur:
+            # One round trip: the UPDATE runs on the pre-insert snapshot, so it never touches the new row
             cur.execute(
-                "INSERT INTO spaces (user_id, name, is_default) VALUES (%s, %s, %s) RETURNING id",
-                (user_id, name, is_default),
+                """
+                WITH ins AS (
+                    INSERT INTO spaces (user_id, name, is_default) VALUES (%s, %s, %s) RETURNING id
+                ), clr AS (
+                    UPDATE spaces SET is_default = FALSE WHERE user_id = %s AND %s AND is_default
+                )
+                SELECT id FROM ins
+                """,
+                (user_id, name, is_default, user_id, is_default),
             )
             sid = int(cur.fetchone()[0])
-            if is_default:
-                cur.execute("UPDATE spaces SET is_default = FALSE WHERE user_id = %s AND id <> %s", (user_id, sid))
-            return sid
+    if is_default:
+        cache_delete(_default_space_key(user_id))
+    return sid
 
 
 def list_spaces(user_id: int) -> List[dict]:
@@ -127,16 +201,30 @@ def list_spaces(user_id: int) -> List[dict]:
 
 
 
+def _default_space_key(user_id: int) -> str:
+    return f"user:default_space:{int(user_id)}"
+
+
 def get_default_space_id(user_id: int) -> Optional[int]:
+    ttl = settings.user_cache_ttl_seconds
+    key = _default_space_key(user_id)
+    if ttl > 0:
+        cached = cache_get(key)
+        if cached:
+            return cached.get("id")
     with get_conn() as conn:
         with conn.cursor() as cur:
             cur.execute("SELECT id FROM spaces WHERE user_id = %s AND is_default = TRUE", (user_id,))
             row = cur.fetchone()
-            return int(row[0]) if row else None
+    sid = int(row[0]) if row else None
+    if ttl > 0:
+        # Wrapped so a user without a default space is cached too
+        cache_set(key, {"id": sid}, ttl_seconds=ttl)
+    return sid
 
 
 def set_default_space(user_id: int, space_id: int) -> None:
     with get_conn() as conn:
         with conn.cursor() as cur:
-            cur.execute("UPDATE spaces SET is_default = FALSE WHERE user_id = %s", (user_id,))
-            cur.execute("UPDATE spaces SET is_default = TRUE WHERE user_id = %s AND id = %s", (user_id, space_id))
+            cur.execute("UPDATE spaces SET is_default = (id = %s) WHERE user_id = %s", (space_id, user_id))
+    cache_delete(_default_space_key(user_id))
@@ -1,12 +1,31 @@
+"""Valkey (Redis-compatible) cache client.
+
+Reply parsing uses hiredis when it is installed (the `cache` extra); redis-py detects it automatically,
+so no code here depends on it. The server runs under uvicorn[standard], whose default loop="auto"
+picks uvloop and httptools, which keeps socket handling for the async client off the pure-Python loop.
+"""
 from __future__ import annotations
 
+import asyncio
+import functools
 import json
 import logging
+import random
+import socket
+import threading
 import time
+import weakref
+from collections import OrderedDict
 from dataclasses import dataclass
-from typing import Any, Optional
+from typing import Any, Iterable, Optional
 
 import redis  # type: ignore
+import redis.asyncio as aredis  # type: ignore
+
+try:
+    import orjson  # type: ignore
+except ImportError:  # pragma: no cover - stdlib json fallback
+    orjson = None  # type: ignore[assignment]
 
 from .config import settings
 
@@ -25,14 +44,78 @@ class _CacheState:
     disabled_until: Optional[float] = None
 
 
+class _TLRU:
+    """Small size-bounded LRU with a per-entry TTL, shared by the threads of one process.
+
+    Holds raw payload bytes so every hit decodes a fresh object, exactly like a Valkey read."""
+
+    def __init__(self, capacity: int, ttl: float) -> None:
+        self.capacity = capacity
+        self.ttl = ttl
+        self._data: "OrderedDict[str, tuple[float, bytes]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            if entry[0] <= time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return entry[1]
+
+    def set(self, key: str, value: bytes) -> None:
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.capacity:
+                self._data.popitem(last=False)
+
+    def discard(self, *keys: str) -> None:
+        with self._lock:
+            for key in keys:
+                self._data.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+
+def _make_local_cache() -> Optional[_TLRU]:
+    if settings.cache_local_ttl_seconds <= 0 or settings.cache_local_max_entries <= 0:
+        return None
+    return _TLRU(settings.cache_local_max_entries, settings.cache_local_ttl_seconds)
+
+
 _client: Optional[redis.Redis] = None
+_pool: Optional[redis.BlockingConnectionPool] = None
+# asyncio connections belong to the loop that opened them, so each running loop gets its own client
+# and pool (e.g. the TestClient portal loop and an anyio test loop); entries go away with their loop
+_aclients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, aredis.Redis]" = weakref.WeakKeyDictionary()
 _state = _CacheState()
+# In-process layer for hot get_json keys; bounds cross-worker staleness to CACHE_LOCAL_TTL_SECONDS
+_local = _make_local_cache()
 
 
-def _namespaced(key: str) -> str:
+def _build_prefix() -> str:
     ns = (settings.cache_namespace or "spacesai").strip() or "spacesai"
     ver = (settings.cache_schema_version or "v1").strip() or "v1"
-    return f"{ns}:{ver}:{key}"
+    return f"{ns}:{ver}:"
+
+
+# Namespace prefix computed once; _namespaced sits on every cache call
+_PREFIX = _build_prefix()
+
+
+def _refresh_prefix() -> None:
+    global _PREFIX
+    _PREFIX = _build_prefix()
+
+
+def _namespaced(key: str) -> str:
+    return _PREFIX + key
 
 
 def _cooldown_active() -> bool:
@@ -62,29 +145,123 @@ def _mark_success() -> None:
     _state.disabled_until = None
 
 
+# Leading byte of zstd-compressed values; JSON text never starts with it
+_ZSTD_MAGIC = b"\x01"
+# Leading bytes of str/int values stored without JSON; untagged payloads are JSON
+_STR_TAG = b"s"
+_INT_TAG = b"i"
+
+
+@functools.lru_cache(maxsize=1)
+def _zstd():
+    try:
+        import zstandard  # type: ignore
+    except ImportError:
+        return None
+    return zstandard
+
+
+def _dumps(value: Any) -> bytes:
+    payload: Optional[bytes] = None
+    if type(value) is str:
+        try:
+            payload = _STR_TAG + value.encode("utf-8")
+        except UnicodeEncodeError:
+            pass  # lone surrogates; JSON escapes them
+    elif type(value) is int:
+        payload = _INT_TAG + str(value).encode("ascii")
+    if payload is None and orjson is not None:
+        try:
+            payload = orjson.dumps(value, option=orjson.OPT_NON_STR_KEYS)
+        except TypeError:
+            pass  # e.g. ints beyond 64 bits; stdlib json handles them
+    if payload is None:
+        payload = json.dumps(value, separators=(",", ":")).encode("utf-8")
+    threshold = settings.cache_compress_threshold
+    if threshold > 0 and len(payload) > threshold:
+        zstd = _zstd()
+        if zstd is not None:
+            return _ZSTD_MAGIC + zstd.ZstdCompressor(level=3).compress(payload)
+    return payload
+
+
+def _loads(data: bytes | str) -> Any:
+    if isinstance(data, bytes) and data[:1] == _ZSTD_MAGIC:
+        zstd = _zstd()
+        if zstd is None:
+            raise ValueError("compressed cache entry but zstandard is not installed")
+        data = zstd.ZstdDecompressor().decompress(data[1:])
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    tag = data[:1]
+    if tag == _STR_TAG:
+        return data[1:].decode("utf-8")
+    if tag == _INT_TAG:
+        return int(data[1:])
+    if orjson is not None:
+        try:
+            return orjson.loads(data)
+        except orjson.JSONDecodeError:
+            pass  # entries written by stdlib json (e.g. NaN) before the switch
+    return json.loads(data)
+
+
+def _keepalive_options() -> dict[int, int]:
+    # Probe idle connections so dead peers are noticed before a request hits them (Linux option names)
+    opts: dict[int, int] = {}
+    for name, value in (("TCP_KEEPIDLE", 30), ("TCP_KEEPINTVL", 10), ("TCP_KEEPCNT", 3)):
+        if hasattr(socket, name):
+            opts[getattr(socket, name)] = value
+    return opts
+
+
+def _pool_kwargs() -> dict[str, Any]:
+    kwargs: dict[str, Any] = {
+        "host": settings.valkey_host,
+        "port": settings.valkey_port,
+        "db": settings.valkey_db,
+        "socket_timeout": 2.0,
+        "socket_connect_timeout": 2.0,
+        "socket_keepalive": True,
+        "socket_keepalive_options": _keepalive_options(),
+        "retry_on_timeout": True,
+        # Values are JSON bytes from _dumps; decoding to str would only be undone by the parser
+        "decode_responses": False,
+        "health_check_interval": 30,
+        "max_connections": max(1, settings.cache_pool_size),
+        "timeout": 2.0,
+    }
+    if settings.valkey_password:
+        kwargs["password"] = settings.valkey_password
+    return kwargs
+
+
+def _connection_pool() -> redis.BlockingConnectionPool:
+    """Process-wide blocking pool built once from settings; callers wait for a free connection instead of
+    opening new ones under load."""
+    global _pool
+    if _pool is not None:
+        return _pool
+    kwargs = _pool_kwargs()
+    if settings.valkey_tls:
+        kwargs["connection_class"] = redis.SSLConnection
+    _pool = redis.BlockingConnectionPool(**kwargs)
+    return _pool
+
+
 def _get_client() -> Optional[redis.Redis]:
     global _client
+    # Healthy fast path: no cooldown pending means no clock read and no function call
+    if _client is not None and _state.disabled_until is None:
+        return _client
+    if _client is not None:
+        return None if _cooldown_active() else _client
     if not settings.valkey_host:
         return None
     if _cooldown_active():
         return None
-    if _client is not None:
-        return _client
     try:
-        kwargs: dict[str, Any] = {
-            "host": settings.valkey_host,
-            "port": settings.valkey_port,
-            "db": settings.valkey_db,
-            "socket_timeout": 2.0,
-            "socket_connect_timeout": 2.0,
-            "retry_on_timeout": True,
-            "decode_responses": True,
-        }
-        if settings.valkey_password:
-            kwargs["password"] = settings.valkey_password
-        if settings.valkey_tls:
-            kwargs["ssl"] = True
-        _client = redis.Redis(**kwargs)
+        _client = redis.Redis(connection_pool=_connection_pool())
         try:
             _client.ping()
             _state.last_ping_ok = True
@@ -103,30 +280,141 @@ def _get_client() -> Optional[redis.Redis]:
         return None
 
 
+def _get_async_client() -> Optional[aredis.Redis]:
+    """asyncio client for request handlers on the running loop; shares health/cooldown state with the
+    sync client. No eager ping: the first command surfaces connection errors through _record_failure."""
+    loop = asyncio.get_running_loop()
+    cli = _aclients.get(loop)
+    if cli is not None and _state.disabled_until is None:
+        return cli
+    if cli is not None:
+        return None if _cooldown_active() else cli
+    if not settings.valkey_host or _cooldown_active():
+        return None
+    try:
+        kwargs = _pool_kwargs()
+        if settings.valkey_tls:
+            kwargs["connection_class"] = aredis.SSLConnection
+        cli = _aclients[loop] = aredis.Redis(connection_pool=aredis.BlockingConnectionPool(**kwargs))
+        return cli
+    except Exception as e:
+        _record_failure(e)
+        logger.warning("Valkey async init failed: %s", e)
+        return None
+
+
+async def aclose_async_client() -> None:
+    """Close the running loop's async client and its pool; call from the app's shutdown hook."""
+    cli = _aclients.pop(asyncio.get_running_loop(), None)
+    if cli is None:
+        return
+    try:
+        # The pool was passed in explicitly, so closing the client alone would leave its connections open
+        await getattr(cli, "aclose", cli.close)()
+        await cli.connection_pool.disconnect()
+    except Exception as e:  # pragma: no cover - best effort on shutdown
+        logger.debug("Valkey async client close failed: %s", e)
+
+
+async def aget_json(key: str) -> Optional[Any]:
+    """Non-blocking get_json for async handlers."""
+    cli = _get_async_client()
+    if not cli:
+        return None
+    try:
+        data = await cli.get(_namespaced(key))
+        if not data:
+            _state.misses += 1
+            return None
+        _state.hits += 1
+        return _loads(data)
+    except Exception as e:
+        _record_failure(e)
+        return None
+
+
+async def aset_json(key: str, value: Any, ttl_seconds: Optional[int] = None) -> None:
+    """Non-blocking set_json for async handlers."""
+    cli = _get_async_client()
+    if not cli:
+        return
+    try:
+        ttl = ttl_seconds if ttl_seconds is not None else settings.cache_ttl_seconds
+        await cli.set(_namespaced(key), _dumps(value), ex=max(int(ttl), 1))
+        _state.sets += 1
+    except Exception as e:
+        _record_failure(e)
+
+
+def jittered_ttl(ttl_seconds: int) -> int:
+    """Spread a TTL by +/- CACHE_TTL_JITTER so a burst of writes does not expire in one burst."""
+    jitter = settings.cache_ttl_jitter
+    if jitter <= 0:
+        return ttl_seconds
+    return max(1, round(ttl_seconds * random.uniform(1 - jitter, 1 + jitter)))
+
+
 def get_json(key: str) -> Optional[Any]:
+    namespaced = _namespaced(key)
+    if _local is not None:
+        data = _local.get(namespaced)
+        if data is not None:
+            _state.hits += 1
+            return _loads(data)
     cli = _get_client()
     if not cli:
         return None
-    namespaced = _namespaced(key)
     try:
         data = cli.get(namespaced)
         if not data:
             _state.misses += 1
             return None
         _state.hits += 1
-        return json.loads(data)
+        if _local is not None:
+            _local.set(namespaced, data)
+        return _loads(data)
     except Exception as e:
         _record_failure(e)
         return None
 
 
+def get_many_json(keys: Iterable[str]) -> list[Optional[Any]]:
+    """get_json for several keys in one MGET round trip; results line up with keys, None for misses."""
+    keys = list(keys)
+    if not keys:
+        return []
+    cli = _get_client()
+    if not cli:
+        return [None] * len(keys)
+    try:
+        raws = cli.mget([_namespaced(k) for k in keys])
+    except Exception as e:
+        _record_failure(e)
+        return [None] * len(keys)
+    out: list[Optional[Any]] = []
+    for data in raws:
+        if not data:
+            _state.misses += 1
+            out.append(None)
+            continue
+        try:
+            out.append(_loads(data))
+            _state.hits += 1
+        except Exception as e:
+            _record_failure(e)
+            out.append(None)
+    return out
+
+
 def set_json(key: str, value: Any, ttl_seconds: Optional[int] = None) -> None:
     cli = _get_client()
     if not cli:
         return
     namespaced = _namespaced(key)
+    if _local is not None:
+        _local.discard(namespaced)
     try:
-        payload = json.dumps(value, separators=(",", ":"))
+        payload = _dumps(value)
         ttl = ttl_seconds if ttl_seconds is not None else settings.cache_ttl_seconds
         cli.set(namespaced, payload, ex=max(int(ttl), 1))
         _state.sets += 1
@@ -134,6 +422,97 @@ def set_json(key: str, value: Any, ttl_seconds: Optional[int] = None) -> None:
         _record_failure(e)
 
 
+def delete_keys(*keys: str) -> None:
+    namespaced = [_namespaced(k) for k in keys]
+    if _local is not None:
+        _local.discard(*namespaced)
+    cli = _get_client()
+    if not cli or not keys:
+        return
+    try:
+        cli.delete(*namespaced)
+    except Exception as e:
+        _record_failure(e)
+
+
+def _hash_ttl(ttl_seconds: Optional[int]) -> int:
+    return max(int(ttl_seconds if ttl_seconds is not None else settings.cache_ttl_seconds), 1)
+
+
+def _decode_fields(fields: Iterable[str], values: list[Any]) -> Optional[dict[str, str]]:
+    if all(v is None for v in values):
+        return None
+    return {f: (v.decode("utf-8") if isinstance(v, bytes) else v) for f, v in zip(fields, values) if v is not None}
+
+
+def set_hash(key: str, mapping: dict[str, str | int | float], ttl_seconds: Optional[int] = None) -> None:
+    """Store a flat dict as a Redis hash so readers can fetch single fields with get_hash_fields."""
+    cli = _get_client()
+    if not cli or not mapping:
+        return
+    namespaced = _namespaced(key)
+    try:
+        pipe = cli.pipeline(transaction=False)
+        pipe.hset(namespaced, mapping=mapping)
+        pipe.expire(namespaced, _hash_ttl(ttl_seconds))
+        pipe.execute()
+        _state.sets += 1
+    except Exception as e:
+        _record_failure(e)
+
+
+def get_hash_fields(key: str, fields: Iterable[str]) -> Optional[dict[str, str]]:
+    """HMGET only the requested fields; returns None when none of them exist."""
+    cli = _get_client()
+    if not cli:
+        return None
+    fields = list(fields)
+    try:
+        out = _decode_fields(fields, cli.hmget(_namespaced(key), fields))
+    except Exception as e:
+        _record_failure(e)
+        return None
+    if out is None:
+        _state.misses += 1
+    else:
+        _state.hits += 1
+    return out
+
+
+async def aset_hash(key: str, mapping: dict[str, str | int | float], ttl_seconds: Optional[int] = None) -> None:
+    """Non-blocking set_hash for async handlers."""
+    cli = _get_async_client()
+    if not cli or not mapping:
+        return
+    namespaced = _namespaced(key)
+    try:
+        pipe = cli.pipeline(transaction=False)
+        pipe.hset(namespaced, mapping=mapping)
+        pipe.expire(namespaced, _hash_ttl(ttl_seconds))
+        await pipe.execute()
+        _state.sets += 1
+    except Exception as e:
+        _record_failure(e)
+
+
+async def aget_hash_fields(key: str, fields: Iterable[str]) -> Optional[dict[str, str]]:
+    """Non-blocking get_hash_fields for async handlers."""
+    cli = _get_async_client()
+    if not cli:
+        return None
+    fields = list(fields)
+    try:
+        out = _decode_fields(fields, await cli.hmget(_namespaced(key), fields))
+    except Exception as e:
+        _record_failure(e)
+        return None
+    if out is None:
+        _state.misses += 1
+    else:
+        _state.hits += 1
+    return out
+
+
 def cache_status() -> dict[str, Any]:
     cooldown_remaining = 0.0
     if _state.disabled_until:
@@ -162,8 +541,17 @@ def cache_status() -> dict[str, Any]:
 
 
 def reset_cache_state_for_tests() -> None:  # pragma: no cover - only used in tests
-    global _client
+    global _client, _pool, _local
     _client = None
+    _aclients.clear()
+    _local = _make_local_cache()
+    _refresh_prefix()
+    if _pool is not None:
+        try:
+            _pool.disconnect()
+        except Exception:
+            pass
+        _pool = None
     _state.hits = _state.misses = _state.sets = _state.failures = 0
     _state.last_error = None
     _state.last_ping_ok = False
@@ -171,13 +559,18 @@ def reset_cache_state_for_tests() -> None:  # pragma: no cover - only used in te
     _state.disabled_until = None
 
 
+@functools.lru_cache(maxsize=4096)
 def _revision_scope(kind: str, user_id: Optional[int], space_id: Optional[int]) -> str:
-    u = f"u{int(user_id) if user_id is not None else 'anon'}"
-    s = f"s{int(space_id) if space_id is not None else 'all'}"
+    # Memoized: the set of (kind, user, space) scopes a process touches is small and stable
+    u = "uanon" if user_id is None else f"u{int(user_id)}"
+    s = "sall" if space_id is None else f"s{int(space_id)}"
     return f"rev:{kind}:{u}:{s}"
 
 
 def bump_revision(kind: str, user_id: Optional[int], space_id: Optional[int]) -> None:
+    if _local is not None:
+        # Revision-scoped keys are not prefix-addressable; uploads/deletes are rare enough to drop everything
+        _local.clear()
     cli = _get_client()
     if not cli:
         return
@@ -188,6 +581,102 @@ def bump_revision(kind: str, user_id: Optional[int], space_id: Optional[int]) ->
         _record_failure(e)
 
 
+def bump_revisions(kinds: Iterable[str], user_id: Optional[int], space_id: Optional[int]) -> None:
+    """Bump several revision counters for one scope in a single pipelined round trip."""
+    if _local is not None:
+        _local.clear()
+    cli = _get_client()
+    if not cli:
+        return
+    try:
+        pipe = cli.pipeline(transaction=False)
+        for kind in kinds:
+            pipe.incr(_namespaced(_revision_scope(kind, user_id, space_id)))
+        pipe.execute()
+    except Exception as e:
+        _record_failure(e)
+
+
+def get_with_revision(key: str, kind: str, user_id: Optional[int], space_id: Optional[int]) -> tuple[Optional[Any], int]:
+    """Fetch a value written by set_at_revision together with the current revision counter in one
+    round trip. Returns (value, rev); value is None on a miss or when it was cached under an older rev."""
+    cli = _get_client()
+    if not cli:
+        return None, 0
+    try:
+        pipe = cli.pipeline(transaction=False)
+        pipe.get(_namespaced(key))
+        pipe.get(_namespaced(_revision_scope(kind, user_id, space_id)))
+        data, raw_rev = pipe.execute()
+    except Exception as e:
+        _record_failure(e)
+        return None, 0
+    rev = int(raw_rev) if raw_rev is not None else 0
+    if not data:
+        _state.misses += 1
+        return None, rev
+    try:
+        entry = _loads(data)
+    except Exception as e:
+        _record_failure(e)
+        return None, rev
+    if not isinstance(entry, dict) or entry.get("rev") != rev:
+        _state.misses += 1
+        return None, rev
+    _state.hits += 1
+    return entry.get("value"), rev
+
+
+def set_at_revision(key: str, value: Any, rev: int, ttl_seconds: Optional[int] = None) -> None:
+    """Cache value tagged with the revision it was computed at; see get_with_revision."""
+    set_json(key, {"rev": rev, "value": value}, ttl_seconds=ttl_seconds)
+
+
+def _fields_at_revision(fields: list[str], values: list[Any], raw_rev: Any) -> tuple[Optional[dict[str, str]], int]:
+    rev = int(raw_rev) if raw_rev is not None else 0
+    out = _decode_fields(fields, values)
+    if out is None or out.pop("rev", None) != str(rev):
+        _state.misses += 1
+        return None, rev
+    _state.hits += 1
+    return out, rev
+
+
+def get_hash_with_revision(key: str, fields: Iterable[str], kind: str, user_id: Optional[int], space_id: Optional[int]) -> tuple[Optional[dict[str, str]], int]:
+    """get_hash_fields plus the current revision counter in one round trip. The hash must carry the
+    revision it was computed at in a "rev" field; entries from an older revision read as a miss."""
+    cli = _get_client()
+    if not cli:
+        return None, 0
+    fields = [*fields, "rev"]
+    try:
+        pipe = cli.pipeline(transaction=False)
+        pipe.hmget(_namespaced(key), fields)
+        pipe.get(_namespaced(_revision_scope(kind, user_id, space_id)))
+        values, raw_rev = pipe.execute()
+    except Exception as e:
+        _record_failure(e)
+        return None, 0
+    return _fields_at_revision(fields, values, raw_rev)
+
+
+async def aget_hash_with_revision(key: str, fields: Iterable[str], kind: str, user_id: Optional[int], space_id: Optional[int]) -> tuple[Optional[dict[str, str]], int]:
+    """Non-blocking get_hash_with_revision for async handlers."""
+    cli = _get_async_client()
+    if not cli:
+        return None, 0
+    fields = [*fields, "rev"]
+    try:
+        pipe = cli.pipeline(transaction=False)
+        pipe.hmget(_namespaced(key), fields)
+        pipe.get(_namespaced(_revision_scope(kind, user_id, space_id)))
+        values, raw_rev = await pipe.execute()
+    except Exception as e:
+        _record_failure(e)
+        return None, 0
+    return _fields_at_revision(fields, values, raw_rev)
+
+
 def get_revision(kind: str, user_id: Optional[int], space_id: Optional[int]) -> int:
     cli = _get_client()
     if not cli:
@@ -199,3 +688,16 @@ def get_revision(kind: str, user_id: Optional[int], space_id: Optional[int]) ->
     except Exception as e:
         _record_failure(e)
         return 0
+
+
+async def aget_revision(kind: str, user_id: Optional[int], space_id: Optional[int]) -> int:
+    """Non-blocking get_revision for async handlers."""
+    cli = _get_async_client()
+    if not cli:
+        return 0
+    try:
+        val = await cli.get(_namespaced(_revision_scope(kind, user_id, space_id)))
+        return int(val) if val is not None else 0
+    except Exception as e:
+        _record_failure(e)
+        return 0
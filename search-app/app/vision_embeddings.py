@@ -1,9 +1,16 @@
 from __future__ import annotations
 
+import contextlib
 import logging
+import multiprocessing
+import os
+import pickle
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from functools import lru_cache
 from pathlib import Path
-from typing import Iterable, List
+from typing import Iterable, List, Optional
 
 from .config import settings
 
@@ -14,6 +21,24 @@ class VisionModelUnavailable(RuntimeError):
     pass
 
 
+def _optimize_clip_model(model, device: str):
+    """channels_last for the conv stem; optionally torch.compile on CUDA (IMAGE_EMBED_COMPILE)."""
+    import torch  # type: ignore
+
+    model.eval()
+    try:
+        model = model.to(memory_format=torch.channels_last)
+    except Exception as exc:  # pragma: no cover - depends on model/device support
+        logger.debug("channels_last not applied to CLIP model: %s", exc)
+    if settings.image_embed_compile and device.startswith("cuda") and hasattr(torch, "compile"):
+        try:
+            # Callers use encode_image rather than forward, so compile that entry point
+            model.encode_image = torch.compile(model.encode_image, mode="reduce-overhead", dynamic=False)
+        except Exception as exc:  # pragma: no cover - depends on torch build
+            logger.warning("torch.compile failed for CLIP model; using eager mode: %s", exc)
+    return model
+
+
 @lru_cache(maxsize=1)
 def _get_clip_model():
     try:
@@ -33,6 +58,7 @@ def _get_clip_model():
         cache_dir=str(cache_dir),
         device=settings.image_embed_device,
     )
+    model = _optimize_clip_model(model, settings.image_embed_device)
     try:
         tokenizer = open_clip.get_tokenizer(variant)
     except Exception as exc:  # pragma: no cover - safety net for API drift
@@ -55,6 +81,18 @@ def _get_clip_text_tokenizer():
         return None
 
 
+def preload_before_fork() -> bool:
+    """Load CLIP in a pre-fork master so workers inherit the weights copy-on-write.
+
+    Skipped for CUDA/MPS: an accelerator context created before fork is not usable in the children,
+    so those workers load their own copy at startup instead. Returns whether the model was loaded."""
+    if not settings.image_embed_device.startswith("cpu"):
+        logger.info("Skipping pre-fork CLIP load on %s; workers load it after fork", settings.image_embed_device)
+        return False
+    _get_clip_model()
+    return True
+
+
 def vision_dependencies_ready(preload_model: bool = False) -> tuple[bool, str | None]:
     """Return whether Pillow/OpenCLIP dependencies are ready along with an optional detail string."""
     try:
@@ -71,6 +109,91 @@ def vision_dependencies_ready(preload_model: bool = False) -> tuple[bool, str |
     return True, None
 
 
+def _inference_context(torch, device: str):
+    """inference_mode plus fp16 autocast on CUDA. Other devices stay in fp32: CPU bf16 autocast is emulated
+    (and slower) on CPUs without native bf16 support."""
+    stack = contextlib.ExitStack()
+    stack.enter_context(torch.inference_mode())
+    if device.startswith("cuda"):
+        stack.enter_context(torch.autocast(device_type="cuda", dtype=torch.float16))
+    return stack
+
+
+_JPEG_EXTS = (".jpg", ".jpeg")
+
+
+def _tensor_preprocess(preprocess):
+    """Rebuild the OpenCLIP PIL preprocess as tensor transforms (Resize/CenterCrop/Normalize), or None when it
+    contains a step that cannot run on tensors. Used for GPU-decoded JPEGs."""
+    try:
+        from torchvision import transforms as T  # type: ignore
+    except ImportError:
+        return None
+    kept = []
+    for step in getattr(preprocess, "transforms", None) or []:
+        if isinstance(step, T.ToTensor) or getattr(step, "__name__", "") == "_convert_to_rgb":
+            continue  # decode_jpeg already yields an RGB tensor; scaling happens in the loader
+        if isinstance(step, (T.Resize, T.CenterCrop, T.Normalize)):
+            kept.append(step)
+            continue
+        return None
+    return T.Compose(kept) if kept else None
+
+
+# CPU decode pool: spawned (not forked) so children never inherit the parent's torch/OpenMP thread state
+_decode_pool: Optional[ProcessPoolExecutor] = None
+_decode_pool_broken = False
+_decode_pool_lock = threading.Lock()
+_decode_preprocess = None  # set in each pool worker by _init_decode_worker
+
+
+def _init_decode_worker(preprocess) -> None:
+    global _decode_preprocess
+    _decode_preprocess = preprocess
+
+
+def _decode_one(path: str):
+    from PIL import Image  # type: ignore
+
+    with Image.open(path) as img:
+        return _decode_preprocess(img.convert("RGB"))
+
+
+def _get_decode_pool(preprocess) -> Optional[ProcessPoolExecutor]:
+    global _decode_pool
+    with _decode_pool_lock:
+        if _decode_pool is None and not _decode_pool_broken:
+            workers = settings.image_decode_workers or max(1, (os.cpu_count() or 1) - 1)
+            if workers <= 1:
+                return None
+            _decode_pool = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_decode_worker,
+                initargs=(preprocess,),
+            )
+        return _decode_pool
+
+
+def _decode_in_processes(paths: List[str], preprocess) -> Optional[list]:
+    """PIL decode + preprocess across cores for CPU inference; None when the pool is unavailable."""
+    global _decode_pool, _decode_pool_broken
+    pool = _get_decode_pool(preprocess)
+    if pool is None:
+        return None
+    try:
+        return list(pool.map(_decode_one, paths, chunksize=4))
+    except (BrokenProcessPool, pickle.PicklingError, AttributeError, TypeError) as exc:
+        # A crashed worker or an unpicklable preprocess; per-image errors (e.g. a corrupt upload) propagate
+        logger.warning("Image decode process pool failed; decoding in threads: %s", exc)
+        with _decode_pool_lock:
+            if _decode_pool is pool:
+                pool.shutdown(wait=False, cancel_futures=True)
+                _decode_pool = None
+                _decode_pool_broken = True
+        return None
+
+
 def embed_image_paths(paths: Iterable[str]) -> List[List[float]]:
     paths = list(paths)
     if not paths:
@@ -80,45 +203,87 @@ def embed_image_paths(paths: Iterable[str]) -> List[List[float]]:
     from PIL import Image  # type: ignore
 
     device = settings.image_embed_device
+    gpu_preprocess = _tensor_preprocess(preprocess) if device.startswith("cuda") else None
+
+    def _load(path: str):
+        if gpu_preprocess is not None and path.lower().endswith(_JPEG_EXTS):
+            try:
+                from torchvision.io import ImageReadMode, decode_jpeg, read_file  # type: ignore
+
+                img = decode_jpeg(read_file(path), mode=ImageReadMode.RGB, device=device)
+                return gpu_preprocess(img.float().div_(255.0))
+            except Exception as exc:  # e.g. progressive/CMYK JPEGs nvJPEG rejects
+                logger.debug("GPU JPEG decode failed for %s; using Pillow: %s", path, exc)
+        with Image.open(path) as img:
+            return preprocess(img.convert("RGB"))
+
+    # Decode/resize in parallel, then run the vision tower on stacked mini-batches. On CPU the model
+    # competes with decode for cores, so decode runs in worker processes; otherwise threads suffice.
+    tensors = None
+    if len(paths) > 1 and device == "cpu":
+        tensors = _decode_in_processes(paths, preprocess)
+    if tensors is None and len(paths) > 1:
+        with ThreadPoolExecutor(max_workers=min(os.cpu_count() or 1, len(paths))) as ex:
+            tensors = list(ex.map(_load, paths))
+    elif tensors is None:
+        tensors = [_load(paths[0])]
+
+    batch_size = max(1, settings.image_embed_batch_size)
     model.eval()
     embeddings: List[List[float]] = []
-    with torch.no_grad():
-        for path in paths:
-            img = Image.open(path).convert("RGB")
-            tensor = preprocess(img).unsqueeze(0).to(device)
-            vec = model.encode_image(tensor)
-            vec /= vec.norm(dim=-1, keepdim=True)
-            embeddings.append(vec.squeeze(0).cpu().tolist())
+    with _inference_context(torch, device):
+        for i in range(0, len(tensors), batch_size):
+            # GPU-decoded JPEGs are already on the device; Pillow-decoded tensors are moved before stacking
+            batch = torch.stack([t.to(device, non_blocking=True) for t in tensors[i : i + batch_size]]).to(
+                memory_format=torch.channels_last
+            )
+            # Normalize in fp32 whatever precision the encoder ran in
+            vecs = torch.nn.functional.normalize(model.encode_image(batch).float(), dim=-1)
+            embeddings.extend(vecs.cpu().tolist())
     return embeddings
 
 
+@lru_cache(maxsize=512)
+def _tokenize_cached(texts: tuple[str, ...]):
+    """Token tensor for a batch of prompts; image search repeats the same queries often.
+
+    Callers must copy before use (``.to(..., copy=True)``): on CPU a plain ``.to("cpu")`` returns the
+    cached tensor itself. On CUDA they are kept in pinned memory so the host-to-device copy is async."""
+    _model, _preprocess, tokenizer = _get_clip_model()
+    import torch  # type: ignore
+
+    try:
+        tokens = tokenizer(list(texts))
+    except TypeError:
+        clip_tokenizer = _get_clip_text_tokenizer()
+        if clip_tokenizer is None:
+            raise
+        logger.debug("Falling back to CLIP SimpleTokenizer for %d prompts", len(texts))
+        encoded = [torch.tensor(clip_tokenizer.encode(text, truncate=True)) for text in texts]
+        max_len = max(tok.shape[0] for tok in encoded)
+        padded = []
+        for tok in encoded:
+            if tok.shape[0] < max_len:
+                pad = torch.zeros(max_len - tok.shape[0], dtype=tok.dtype)
+                tok = torch.cat([tok, pad], dim=0)
+            padded.append(tok)
+        tokens = torch.stack(padded, dim=0)
+    if settings.image_embed_device.startswith("cuda"):
+        tokens = tokens.pin_memory()
+    return tokens
+
+
 def embed_image_texts(texts: Iterable[str]) -> List[List[float]]:
     texts = [t.strip() for t in texts if t and t.strip()]
     if not texts:
         return []
-    model, _preprocess, tokenizer = _get_clip_model()
-    clip_tokenizer = _get_clip_text_tokenizer()
+    model, _preprocess, _tokenizer = _get_clip_model()
     import torch  # type: ignore
 
     device = settings.image_embed_device
     model.eval()
-    with torch.no_grad():
-        try:
-            tokens = tokenizer(texts)
-        except TypeError:
-            if clip_tokenizer is None:
-                raise
-            logger.debug("Falling back to CLIP SimpleTokenizer for %d prompts", len(texts))
-            encoded = [torch.tensor(clip_tokenizer.encode(text, truncate=True)) for text in texts]
-            max_len = max(tok.shape[0] for tok in encoded)
-            padded = []
-            for tok in encoded:
-                if tok.shape[0] < max_len:
-                    pad = torch.zeros(max_len - tok.shape[0], dtype=tok.dtype)
-                    tok = torch.cat([tok, pad], dim=0)
-                padded.append(tok)
-            tokens = torch.stack(padded, dim=0)
-        tokens = tokens.to(device)
-        vecs = model.encode_text(tokens)
-        vecs /= vecs.norm(dim=-1, keepdim=True)
-    return vecs.cpu().tolist()
\ No newline at end of file
+    with _inference_context(torch, device):
+        # copy=True: never hand the cached tensor itself to the model, even when device is "cpu"
+        tokens = _tokenize_cached(tuple(texts)).to(device, non_blocking=True, copy=True)
+        vecs = torch.nn.functional.normalize(model.encode_text(tokens).float(), dim=-1)
+    return vecs.cpu().tolist()
@@ -0,0 +1,18 @@
+"""Gunicorn settings for multi-worker deployments.
+
+    uv sync --extra serve --extra image
+    uv run gunicorn -c gunicorn.conf.py app.main:app
+
+preload_app imports the app once in the master; with GUNICORN_PRELOAD the CPU CLIP model is loaded
+there and forked workers share its weights copy-on-write instead of each loading a copy.
+"""
+import os
+
+# Must be set before the app (and its settings) are imported by the master
+os.environ.setdefault("GUNICORN_PRELOAD", "true")
+
+bind = f"{os.getenv('HOST', '0.0.0.0')}:{os.getenv('PORT', '8000')}"
+workers = int(os.getenv("WORKERS", "1"))
+worker_class = "uvicorn.workers.UvicornWorker"
+preload_app = True
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "120"))
@@ -0,0 +1,19 @@
+"""Optional native build for the text chunking hot paths.
+
+All metadata lives in pyproject.toml. When Cython is installed, app/text_utils_fast.pyx is compiled
+(``pip install cython && python setup.py build_ext --inplace``); without it the package installs as
+pure Python and text_utils uses its own implementations.
+"""
+from setuptools import Extension, setup
+
+try:
+    from Cython.Build import cythonize
+except ImportError:
+    ext_modules = []
+else:
+    ext_modules = cythonize(
+        [Extension("app.text_utils_fast", ["app/text_utils_fast.pyx"])],
+        compiler_directives={"language_level": "3"},
+    )
+
+setup(ext_modules=ext_modules)
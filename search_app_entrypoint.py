@@ -1,19 +1,26 @@
 from __future__ import annotations
 
+import functools
 import os
 import sys
 from pathlib import Path
 
 
+_ROOT = Path(__file__).resolve().parent
+# Paths already ensured on sys.path; later calls are a set lookup instead of a list scan
+_added: set[str] = set()
+
+
 def patch_path() -> None:
-    root = Path(__file__).resolve().parent
-    if str(root) not in sys.path:
-        sys.path.insert(0, str(root))
-    app_dir = root / "search-app"
-    if str(app_dir) not in sys.path:
-        sys.path.insert(0, str(app_dir))
+    for p in (str(_ROOT), str(_ROOT / "search-app")):
+        if p in _added:
+            continue
+        if p not in sys.path:
+            sys.path.insert(0, p)
+        _added.add(p)
 
 
+@functools.lru_cache(maxsize=1)
 def get_app():
     patch_path()
     from app.main import app
@@ -0,0 +1,80 @@
+from __future__ import annotations
+
+from collections import OrderedDict
+from typing import Any, Optional
+
+
+class DictCache:
+    """In-memory stand-in for valkey_cache.get_json/set_json (and the hash variants) that records every write."""
+
+    def __init__(self) -> None:
+        self.store: dict[str, Any] = {}
+        self.writes: list[tuple[str, Optional[int]]] = []
+        self.keys_seen: list[str] = []
+        self.ttls: list[Optional[int]] = []
+        self.revisions: dict[tuple[str, Optional[int], Optional[int]], int] = {}
+
+    def get(self, key: str) -> Any:
+        self.keys_seen.append(key)
+        return self.store.get(key)
+
+    def set(self, key: str, value: Any, ttl_seconds: Optional[int] = None) -> None:
+        # Plain assignment, not setdefault: a re-store must overwrite like a real SET
+        self.store[key] = value
+        self.writes.append((key, ttl_seconds))
+        self.ttls.append(ttl_seconds)
+
+    def get_hash_fields(self, key: str, fields: Any) -> Optional[dict[str, str]]:
+        entry = self.get(key)
+        out = {f: entry[f] for f in fields if f in entry} if entry else {}
+        return out or None
+
+    def get_hash_with_revision(self, key: str, fields: Any, kind: str, user_id: Optional[int], space_id: Optional[int]) -> tuple[Optional[dict[str, str]], int]:
+        # Revision counters live in self.revisions, so nothing reaches a real Valkey
+        rev = self.revisions.get((kind, user_id, space_id), 0)
+        out = self.get_hash_fields(key, [*fields, "rev"])
+        if not out or out.pop("rev", None) != str(rev):
+            return None, rev
+        return out, rev
+
+    def set_hash(self, key: str, mapping: dict[str, Any], ttl_seconds: Optional[int] = None) -> None:
+        # Hash field values come back as strings, as they do from Valkey
+        self.set(key, {f: str(v) for f, v in mapping.items()}, ttl_seconds)
+
+
+class ClockCache(DictCache):
+    """DictCache that behaves like the Valkey backend under maxmemory: per-entry TTLs (clamped to >= 1s,
+    as set_json does) measured on a fake clock the test advances, plus LRU eviction past `maxsize`."""
+
+    def __init__(self, maxsize: int = 128, default_ttl: int = 60) -> None:
+        super().__init__()
+        self.store: OrderedDict[str, Any] = OrderedDict()
+        self.maxsize = maxsize
+        self.default_ttl = default_ttl
+        self.t = 0.0
+        self._expires: dict[str, float] = {}
+
+    def now(self) -> float:
+        return self.t
+
+    def advance(self, seconds: float) -> None:
+        self.t += seconds
+
+    def get(self, key: str) -> Any:
+        self.keys_seen.append(key)
+        if key not in self.store:
+            return None
+        if self._expires[key] <= self.t:
+            del self.store[key], self._expires[key]
+            return None
+        self.store.move_to_end(key)
+        return self.store[key]
+
+    def set(self, key: str, value: Any, ttl_seconds: Optional[int] = None) -> None:
+        super().set(key, value, ttl_seconds)
+        self.store.move_to_end(key)
+        ttl = ttl_seconds if ttl_seconds is not None else self.default_ttl
+        self._expires[key] = self.t + max(int(ttl), 1)
+        while len(self.store) > self.maxsize:
+            evicted, _ = self.store.popitem(last=False)
+            del self._expires[evicted]
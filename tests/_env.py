@@ -0,0 +1,12 @@
+from __future__ import annotations
+
+import os
+
+
+def e2e_env_ready() -> bool:
+    """True when DB and OpenSearch are configured, i.e. the E2E tests can run."""
+    if not os.getenv("DATABASE_URL"):
+        for k in ("DB_HOST", "DB_NAME", "DB_USER", "DB_PASSWORD"):
+            if not os.getenv(k):
+                return False
+    return bool(os.getenv("OPENSEARCH_HOST"))
@@ -0,0 +1,48 @@
+from __future__ import annotations
+
+import sys
+from pathlib import Path
+
+import pytest
+
+# Path setup happens once here for every test module: the repo root for search_app_entrypoint, then
+# search-app/ for the `app` package (patch_path is cheap and does not import the app).
+REPO_ROOT = Path(__file__).resolve().parent.parent
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
+from search_app_entrypoint import patch_path  # noqa: E402
+
+patch_path()
+
+from _env import e2e_env_ready  # noqa: E402
+
+
+@pytest.fixture(scope="session")
+def app():
+    # One FastAPI app per test session; importing it pulls in the DB/search/model modules
+    from search_app_entrypoint import get_app
+
+    return get_app()
+
+
+@pytest.fixture(scope="session")
+def client(app):
+    from fastapi.testclient import TestClient
+
+    with TestClient(app) as c:
+        yield c
+
+
+@pytest.fixture(scope="session", autouse=True)
+def warm_models():
+    # Load the sentence-transformer once per session so the first E2E upload does not pay the
+    # model load inside its own timing. Unit tests stub embeddings, so skip it when E2E cannot run.
+    if not e2e_env_ready():
+        return
+    try:
+        from app.embeddings import embed_texts
+
+        embed_texts(["warmup"])
+    except Exception:
+        pass  # the E2E test reports real embedding failures itself
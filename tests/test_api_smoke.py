@@ -1,13 +1,9 @@
 from __future__ import annotations
 
 import os
-import json
 import pytest
 from fastapi.testclient import TestClient
 
-# Import the FastAPI app
-from search_app_entrypoint import get_app  # helper to avoid heavy imports
-
 
 def _db_config_present() -> bool:
     if os.getenv("DATABASE_URL"):
@@ -16,14 +12,6 @@ def _db_config_present() -> bool:
     return all(os.getenv(k) for k in req)
 
 
-@pytest.fixture(scope="session")
-def client():
-    # Build app lazily to ensure environment is already loaded
-    app = get_app()
-    with TestClient(app) as c:
-        yield c
-
-
 def test_health(client: TestClient):
     r = client.get("/api/health")
     assert r.status_code == 200
@@ -1,34 +1,48 @@
 from __future__ import annotations
 
+import asyncio
+import contextlib
+from concurrent.futures import ThreadPoolExecutor
 from fastapi.testclient import TestClient
-import sys
-from pathlib import Path
+import pytest
+import statistics
+import threading
+import time
+from unittest import mock
 
-REPO_ROOT = Path(__file__).resolve().parent.parent
-if str(REPO_ROOT) not in sys.path:
-    sys.path.insert(0, str(REPO_ROOT))
+from _cache_stubs import ClockCache
 
-from search_app_entrypoint import get_app
 
+@pytest.fixture
+def patch_spec():
+    """Like monkeypatch.setattr, but through mock.patch.object(autospec=True): stubs must accept the real
+    signature, so a renamed or dropped parameter fails here instead of passing silently."""
+    with contextlib.ExitStack() as stack:
+        def _patch(target, name, **kwargs):
+            return stack.enter_context(mock.patch.object(target, name, autospec=True, **kwargs))
 
-def test_rag_answers_are_cached(monkeypatch):
-    from app import search
-    from app.search import ChunkHit
+        yield _patch
 
-    # Stub semantic search to avoid DB/embedding dependencies
-    hits = [ChunkHit(chunk_id=1, document_id=1, chunk_index=0, content="context chunk")]
-    monkeypatch.setattr(search, "semantic_search", lambda *args, **kwargs: hits)
 
-    cache_store: dict[str, dict] = {}
+@pytest.fixture(scope="module")
+def client_no_lifespan(app):
+    # Shares the session app but is not entered as a context manager, so no startup hooks
+    # (DB init, model preload) run; these endpoint tests never need them.
+    return TestClient(app)
 
-    def fake_cache_get(key: str):
-        return cache_store.get(key)
 
-    def fake_cache_set(key: str, value, ttl_seconds=None):
-        cache_store[key] = value
+@pytest.mark.parametrize("providers", [("openai", "anthropic", "ollama")])
+def test_rag_answers_are_cached(patch_spec, providers):
+    from app import llm, search
+    from app.search import ChunkHit
 
-    monkeypatch.setattr(search, "cache_get", fake_cache_get)
-    monkeypatch.setattr(search, "cache_set", fake_cache_set)
+    # Stub semantic search to avoid DB/embedding dependencies; its call count proves hits skip retrieval
+    hits = [ChunkHit(chunk_id=1, document_id=1, chunk_index=0, content="context chunk")]
+    semantic_search = patch_spec(search, "semantic_search", return_value=hits)
+
+    cache = ClockCache()
+    patch_spec(search, "get_hash_with_revision", side_effect=cache.get_hash_with_revision)
+    patch_spec(search, "set_hash", side_effect=cache.set_hash)
 
     # Track LLM invocation count
     call_counter = {"count": 0}
@@ -37,72 +51,276 @@ def test_rag_answers_are_cached(monkeypatch):
         call_counter["count"] += 1
         return f"answer-{call_counter['count']}"
 
-    monkeypatch.setattr("app.llm.chat", fake_chat)
+    patch_spec(llm, "chat", side_effect=fake_chat)
 
-    ans1, _, _ = search.rag("What is SpacesAI?", mode="semantic", top_k=3, user_id=42, space_id=5, provider_override="openai")
-    ans2, _, _ = search.rag("What is SpacesAI?", mode="semantic", top_k=3, user_id=42, space_id=5, provider_override="openai")
+    for i, provider in enumerate(providers, start=1):
+        ans1, hits1, _ = search.rag("What is SpacesAI?", mode="semantic", top_k=3, user_id=42, space_id=5, provider_override=provider)
+        ans2, hits2, _ = search.rag("What is SpacesAI?", mode="semantic", top_k=3, user_id=42, space_id=5, provider_override=provider)
 
-    assert ans1 == ans2 == "answer-1"
-    assert call_counter["count"] == 1  # second call served from cache
-    assert cache_store  # ensure something was cached
+        assert ans1 == ans2 == f"answer-{i}"  # a provider never gets another provider's answer
+        assert call_counter["count"] == i  # second call served from cache
+        assert semantic_search.call_count == i  # ...without running retrieval again
+        assert hits1 == hits2 == hits
 
+    # An upload bumps the space's text revision: the stored answer no longer matches and is recomputed
+    cache.revisions[("text", 42, 5)] = 1
+    search.rag("What is SpacesAI?", mode="semantic", top_k=3, user_id=42, space_id=5, provider_override=providers[0])
+    assert call_counter["count"] == len(providers) + 1
 
-def test_health_endpoint_reports_cache_state(monkeypatch):
-    from app import main as app_main
+    # Provider is part of the key: one entry per provider
+    assert len(cache.store) == len(providers)
+    assert all(ttl is None or ttl > 0 for _key, ttl in cache.writes)
 
-    monkeypatch.setattr(
-        app_main,
-        "cache_status",
-        lambda: {"state": "cooldown", "expected": True, "connected": False},
-    )
 
-    client = TestClient(get_app())
-    resp = client.get("/api/health")
+def test_rag_cache_entries_expire(patch_spec):
+    from app import llm, search
+    from app.config import settings
+    from app.search import ChunkHit
+
+    patch_spec(search, "semantic_search", return_value=[ChunkHit(chunk_id=1, document_id=1, chunk_index=0, content="c")])
+
+    cache = ClockCache()
+    patch_spec(search, "get_hash_with_revision", side_effect=cache.get_hash_with_revision)
+    patch_spec(search, "set_hash", side_effect=cache.set_hash)
+    chat = patch_spec(llm, "chat", return_value="answer")
+
+    def ask():
+        return search.rag("Expiring?", mode="semantic", top_k=3, user_id=42, space_id=5, provider_override="openai")
+
+    base, jitter = settings.llm_cache_ttl_seconds, settings.cache_ttl_jitter
+    ask()
+    cache.advance(base * (1 - jitter) - 1)  # still inside the shortest jittered TTL
+    ask()
+    assert chat.call_count == 1
+
+    cache.advance(2 * base * jitter + 2)  # past the longest one
+    ask()
+    assert chat.call_count == 2  # expired entry is a miss, not a stale answer
+
+
+def test_rag_cache_miss_is_single_flight(patch_spec):
+    from app import llm, search
+    from app.search import ChunkHit
+
+    hits = [ChunkHit(chunk_id=1, document_id=1, chunk_index=0, content="context chunk")]
+    patch_spec(search, "semantic_search", return_value=hits)
+
+    cache = ClockCache()
+    patch_spec(search, "get_hash_with_revision", side_effect=cache.get_hash_with_revision)
+    patch_spec(search, "set_hash", side_effect=cache.set_hash)
+
+    lock = threading.Lock()
+    call_counter = {"count": 0}
+
+    def slow_chat(question: str, context: str, provider_override=None, **_: object):
+        with lock:
+            call_counter["count"] += 1
+        time.sleep(0.05)  # keep the miss open while the other callers arrive
+        return "answer"
+
+    patch_spec(llm, "chat", side_effect=slow_chat)
+
+    def ask():
+        return search.rag("Cold key?", mode="semantic", top_k=3, user_id=7, space_id=1, provider_override="openai")[0]
+
+    with ThreadPoolExecutor(max_workers=20) as ex:
+        answers = list(ex.map(lambda _: ask(), range(20)))
+
+    assert answers == ["answer"] * 20
+    assert call_counter["count"] == 1  # one LLM call for a stampede on a cold key
+
+
+def test_arag_waiters_survive_first_caller_cancel(patch_spec):
+    from app import search
+    from app.search import ChunkHit
+
+    hits = [ChunkHit(chunk_id=1, document_id=1, chunk_index=0, content="context chunk")]
+    patch_spec(search, "aget_hash_with_revision", return_value=(None, 0))
+    patch_spec(search, "aset_hash", return_value=None)
+    release = threading.Event()
+
+    def slow_retrieve(query, mode, top_k, user_id, space_id):
+        release.wait(5)  # hold the shared work open while the first caller goes away
+        return hits, "context chunk"
+
+    retrieve = patch_spec(search, "_rag_retrieve", side_effect=slow_retrieve)
+    patch_spec(search, "_rag_answer", return_value=("answer", True))
+
+    async def scenario():
+        ask = lambda: search.arag("Disconnect?", mode="semantic", top_k=3, user_id=7, space_id=1, provider_override="openai")
+        first = asyncio.create_task(ask())
+        await asyncio.sleep(0.05)
+        second = asyncio.create_task(ask())
+        await asyncio.sleep(0.05)
+        first.cancel()  # e.g. the first client disconnected
+        await asyncio.sleep(0)
+        release.set()
+        result = await second
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        return result
+
+    answer, got_hits, used_llm = asyncio.run(scenario())
+    assert (answer, got_hits, used_llm) == ("answer", hits, True)
+    assert retrieve.call_count == 1  # the second caller joined the first one's work
+    assert not any(search._RAG_INFLIGHT.values())  # the loop's in-flight map was emptied
+
+
+def test_async_valkey_client_is_per_event_loop():
+    from app import valkey_cache
+    from app.config import settings
+
+    async def clients():
+        return valkey_cache._get_async_client(), valkey_cache._get_async_client()
+
+    # Constructing the client does not connect, so no server is needed
+    with mock.patch.object(settings, "valkey_host", "valkey.invalid"):
+        valkey_cache.reset_cache_state_for_tests()
+        try:
+            a1, a2 = asyncio.run(clients())
+            b1, _ = asyncio.run(clients())
+        finally:
+            valkey_cache.reset_cache_state_for_tests()
+    assert a1 is a2  # reused within a loop
+    assert a1 is not b1  # never shared with another loop's connections
+
+
+def test_rag_cache_ttls_are_jittered(patch_spec):
+    from app import llm, search
+    from app.config import settings
+    from app.search import ChunkHit
+
+    hits = [ChunkHit(chunk_id=1, document_id=1, chunk_index=0, content="context chunk")]
+    patch_spec(search, "semantic_search", return_value=hits)
+
+    cache = ClockCache()
+    patch_spec(search, "get_hash_with_revision", side_effect=cache.get_hash_with_revision)
+    patch_spec(search, "set_hash", side_effect=cache.set_hash)
+    patch_spec(llm, "chat", side_effect=lambda question, context, provider_override=None, **_: f"answer to {question}")
+
+    for i in range(50):
+        search.rag(f"q-{i}", mode="semantic", top_k=3, user_id=42, space_id=5, provider_override="openai")
+
+    # Fixed TTLs would make entries written together expire together
+    assert len(cache.ttls) == 50
+    assert len(set(cache.ttls)) > 1
+    assert statistics.stdev(cache.ttls) > 0
+    base, jitter = settings.llm_cache_ttl_seconds, settings.cache_ttl_jitter
+    assert all(base * (1 - jitter) - 1 <= ttl <= base * (1 + jitter) + 1 for ttl in cache.ttls)
+
+
+def test_health_endpoint_reports_cache_state(client_no_lifespan):
+    from app.valkey_cache import cache_status
+
+    overrides = client_no_lifespan.app.dependency_overrides
+    overrides[cache_status] = lambda: {"state": "cooldown", "expected": True, "connected": False}
+    try:
+        resp = client_no_lifespan.get("/api/health")
+    finally:
+        overrides.pop(cache_status, None)
     assert resp.status_code == 200
     body = resp.json()
     assert body["status"] == "degraded"
     assert body["cache"]["state"] == "cooldown"
 
 
-def test_image_search_cache_invalidation(monkeypatch):
+def _stub_image_adapter(patch_spec):
     from app import search
 
-    cache_store: dict[str, list] = {}
-    monkeypatch.setattr(search, "cache_get", lambda key: cache_store.get(key))
-    monkeypatch.setattr(search, "cache_set", lambda key, value: cache_store.setdefault(key, value))
+    adapter_cls = patch_spec(search, "OpenSearchAdapter")
+    search_images = adapter_cls.return_value.search_images
+    search_images.return_value = [
+        {
+            "_source": {
+                "doc_id": 9,
+                "image_id": 99,
+                "thumbnail_path": "/thumb.png",
+                "file_path": "/file.png",
+                "caption": "diagram",
+                "tags": ["policy"],
+            },
+            "_score": 1.0,
+        }
+    ]
+    return search_images
+
+
+def test_image_search_cache_invalidation(patch_spec):
+    from app import search
+
+    cache = ClockCache()
+    patch_spec(search, "cache_get", side_effect=cache.get)
+    patch_spec(search, "cache_set", side_effect=cache.set)
 
     revision = {"value": 1}
-    monkeypatch.setattr(search, "get_revision", lambda *_args, **_kwargs: revision["value"])
-
-    calls = {"count": 0}
-
-    class DummyAdapter:
-        def search_images(self, **kwargs):  # type: ignore[override]
-            calls["count"] += 1
-            return [
-                {
-                    "_source": {
-                        "doc_id": 9,
-                        "image_id": 99,
-                        "thumbnail_path": "/thumb.png",
-                        "file_path": "/file.png",
-                        "caption": "diagram",
-                        "tags": ["policy"],
-                    },
-                    "_score": 1.0,
-                }
-            ]
-
-    monkeypatch.setattr(search, "OpenSearchAdapter", lambda: DummyAdapter())
+    patch_spec(search, "get_revision", side_effect=lambda *_args, **_kwargs: revision["value"])
 
+    search_images = _stub_image_adapter(patch_spec)
     args = dict(query="diagram", vector=None, top_k=5, user_id=1, space_id=2, tags=["policy"])
 
     res1 = search.image_search(**args)
     res2 = search.image_search(**args)
     assert res1 == res2
-    assert calls["count"] == 1  # second call served from cache
+    assert search_images.call_count == 1  # second call served from cache
 
     revision["value"] = 2  # simulate bump_revision after new upload/delete
     res3 = search.image_search(**args)
     assert res3 == res1
-    assert calls["count"] == 2  # cache miss due to revision change
\ No newline at end of file
+    assert search_images.call_count == 2  # cache miss due to revision change
+
+    # Generational-key contract: the revision is part of the key, so a bump must change the key
+    # (not just happen to miss). Caching by user/space/query alone would fail here.
+    assert len(set(cache.keys_seen)) == 2
+    assert cache.keys_seen[0] == cache.keys_seen[1] != cache.keys_seen[2]
+
+
+def test_upload_bumps_image_revision(patch_spec, client_no_lifespan, tmp_path):
+    from types import SimpleNamespace
+
+    from app import main as app_main, search
+    from app.config import settings
+    from app.session import sign_session
+
+    cache = ClockCache()
+    patch_spec(search, "cache_get", side_effect=cache.get)
+    patch_spec(search, "cache_set", side_effect=cache.set)
+
+    # Real bump_revisions is replaced by one that advances the same counters image_search reads,
+    # so the test fails if upload stops bumping (or bumps the wrong kind/scope).
+    revisions: dict[tuple, int] = {}
+    patch_spec(search, "get_revision", side_effect=lambda kind, user_id, space_id: revisions.get((kind, user_id, space_id), 0))
+
+    def fake_bump(kinds, user_id, space_id):
+        for kind in kinds:
+            revisions[(kind, user_id, space_id)] = revisions.get((kind, user_id, space_id), 0) + 1
+
+    bump = patch_spec(app_main, "bump_revisions", side_effect=fake_bump)
+
+    # Keep the write path off disk/DB/OpenSearch; only its invalidation side effect matters here
+    stored = tmp_path / "diagram.png"
+    stored.write_bytes(b"png")
+    patch_spec(app_main, "save_upload", return_value=(str(stored), None))
+    patch_spec(app_main, "ingest_file_path", return_value=SimpleNamespace(document_id=5, num_chunks=1))
+    patch_spec(app_main, "api_image_search_diagnostics", return_value={})
+    patch_spec(app_main, "get_conn", side_effect=RuntimeError("no db in unit tests"))
+
+    search_images = _stub_image_adapter(patch_spec)
+    args = dict(query="diagram", vector=None, top_k=5, user_id=1, space_id=2, tags=["policy"])
+
+    search.image_search(**args)
+    search.image_search(**args)
+    assert search_images.call_count == 1  # warm
+
+    token = sign_session({"user_id": 1, "email": "tester@example.com"})
+    resp = client_no_lifespan.post(
+        "/api/upload",
+        files={"files": ("diagram.png", b"png", "image/png")},
+        data={"space_id": "2"},
+        headers={"Cookie": f"{settings.session_cookie_name}={token}"},
+    )
+    assert resp.status_code == 200
+    assert resp.json()["results"][0]["status"] == "ok"
+    bump.assert_called_once_with(("text", "image"), 1, 2)
+
+    search.image_search(**args)
+    assert search_images.call_count == 2  # the upload invalidated the cached image results
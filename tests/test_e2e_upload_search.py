@@ -1,73 +1,76 @@
 from __future__ import annotations
 
+import asyncio
 import io
-import os
-import json
-import time
+import httpx
 import pytest
-from fastapi.testclient import TestClient
 
-from search_app_entrypoint import get_app
+from _env import e2e_env_ready
 
 
-def _env_ready() -> bool:
-    # Require DB and OpenSearch to run this e2e
-    if os.getenv("DATABASE_URL"):
-        pass
-    else:
-        for k in ("DB_HOST", "DB_NAME", "DB_USER", "DB_PASSWORD"):
-            if not os.getenv(k):
-                return False
-    if not os.getenv("OPENSEARCH_HOST"):
-        return False
-    return True
+@pytest.fixture(scope="module")
+def anyio_backend():
+    return "asyncio"
 
 
-@pytest.fixture(scope="session")
-def client():
-    app = get_app()
-    with TestClient(app) as c:
-        yield c
+@pytest.fixture(scope="module")
+async def client(request, anyio_backend):
+    # Skip before requesting the session app so the heavy import graph is never loaded when E2E cannot run
+    if not e2e_env_ready():
+        pytest.skip("DB/OpenSearch not configured for E2E test")
+    app = request.getfixturevalue("app")
+    # Native ASGI transport (no sync bridge); it does not run lifespan, so drive startup/shutdown here
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://testserver") as c:
+            yield c
 
 
-@pytest.mark.skipif(not _env_ready(), reason="DB/OpenSearch not configured for E2E test")
-def test_e2e_upload_search_reindex(client: TestClient):
+@pytest.mark.anyio
+async def test_e2e_upload_search_reindex(client: httpx.AsyncClient):
     email = "e2e_user@example.com"
     password = "P@ssw0rd!"
 
-    # Register or ignore if exists
-    r = client.post("/api/register", json={"email": email, "password": password})
-    assert r.status_code in (200, 400)
+    # Register or ignore if exists; anything else surfaces via HTTPStatusError with the response attached
+    r = await client.post("/api/register", json={"email": email, "password": password})
+    if r.status_code not in (200, 400):
+        r.raise_for_status()
 
     # Login
-    r = client.post("/api/login", json={"email": email, "password": password})
-    assert r.status_code == 200
+    (await client.post("/api/login", json={"email": email, "password": password})).raise_for_status()
 
     # Upload a small text file
     fbytes = b"Hello SpacesAI. This is a tiny test document for E2E."
     files = {"files": ("e2e.txt", io.BytesIO(fbytes), "text/plain")}
-    r = client.post("/api/upload", files=files)
-    assert r.status_code == 200
-    js = r.json()
-    assert "results" in js and len(js["results"]) >= 1
-    doc_id = js["results"][0].get("document_id")
-    assert doc_id is not None
+    r = await client.post("/api/upload", files=files)
+    r.raise_for_status()
+    results = r.json().get("results") or []
+    doc_id = results[0].get("document_id") if results else None
+    assert doc_id is not None, r.text
 
-    # Allow small delay for OS dual-write visibility
-    time.sleep(1.5)
-
-    # Search (semantic)
-    r = client.post("/api/search", json={"query": "tiny test document", "mode": "semantic", "top_k": 5})
-    assert r.status_code == 200
-    js = r.json()
-    assert "hits" in js
+    # Poll (semantic) until the OpenSearch dual-write is visible instead of sleeping a fixed time
+    semantic = {"query": "tiny test document", "mode": "semantic", "top_k": 5}
+    for _ in range(30):
+        r = await client.post("/api/search", json=semantic)
+        r.raise_for_status()
+        js = r.json()
+        if js.get("hits"):
+            break
+        await asyncio.sleep(0.1)
 
     # Reindex admin call (doc scope)
-    r = client.post("/api/admin/reindex", json={"doc_id": doc_id})
-    assert r.status_code == 200
+    (await client.post("/api/admin/reindex", json={"doc_id": doc_id})).raise_for_status()
+
+    # Search again, semantic and BM25 concurrently
+    fulltext = {"query": "SpacesAI", "mode": "fulltext", "top_k": 5}
+    after = await asyncio.gather(client.post("/api/search", json=semantic), client.post("/api/search", json=fulltext))
+    for r in after:
+        r.raise_for_status()
 
-    # Search again (BM25)
-    r = client.post("/api/search", json={"query": "SpacesAI", "mode": "fulltext", "top_k": 5})
-    assert r.status_code == 200
-    js = r.json()
-    assert "hits" in js
+    # Collect shape problems and report them together rather than stopping at the first
+    problems = [f"{label}: no 'hits' in {body}" for label, body in (
+        ("semantic before reindex", js),
+        ("semantic after reindex", after[0].json()),
+        ("fulltext after reindex", after[1].json()),
+    ) if "hits" not in body]
+    assert not problems, problems
@@ -0,0 +1,18 @@
+from __future__ import annotations
+
+
+def test_header_footer_removal_keeps_last_line_of_newline_terminated_pages():
+    from app.text_utils import _remove_common_headers_footers
+
+    # PyMuPDF/pdfium pages end in "\n"; a last line that never repeats must survive
+    pages = ["ACME Corp\nIntro text\nunique one\n", "ACME Corp\nBody\nunique two\n", "ACME Corp\nMore\nunique three\n"]
+    cleaned = _remove_common_headers_footers(pages)
+    assert all("ACME Corp" not in p for p in cleaned)  # repeated header still removed
+    assert [p.strip().splitlines()[-1] for p in cleaned] == ["unique one", "unique two", "unique three"]
+
+
+def test_header_footer_removal_splits_crlf_and_form_feeds():
+    from app.text_utils import _remove_common_headers_footers
+
+    pages = ["ACME Corp\r\nfirst\fPage 1 of 3", "ACME Corp\r\nsecond\fPage 2 of 3", "ACME Corp\r\nthird\fPage 3 of 3"]
+    assert _remove_common_headers_footers(pages) == ["first", "second", "third"]